@@ -0,0 +1,100 @@
+from typing import NamedTuple
+import numpy as np
+
+
+class Schedule(NamedTuple):
+    payment: np.ndarray
+    interest: np.ndarray
+    principal: np.ndarray
+    balance: np.ndarray
+
+
+# Monthly rate from an annual rate in percent, e.g. 9.0 -> 0.0075
+def monthly_rate(annual_rate):
+    return np.asarray(annual_rate, dtype=np.float64) / 1200.0
+
+
+# Fraction of the outstanding balance that pays it off over the remaining months:
+# r / (1 - (1 + r)^-n), or 1 / n when the rate is zero. Zero once the term is over.
+def _annuity_factor(rate, remaining):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = rate / -np.expm1(-remaining * np.log1p(rate))
+        factor = np.where(rate == 0, 1.0 / remaining, factor)
+    return np.where(remaining > 0, factor, 0.0)
+
+
+# Equated monthly instalment for a principal, annual rate in percent and term in months
+def emi(principal, annual_rate, months):
+    principal = np.asarray(principal, dtype=np.float64)
+    return principal * _annuity_factor(monthly_rate(annual_rate), np.asarray(months, dtype=np.float64))
+
+
+# Monthly rates for a block of months as a (loans, months) array. Fixed rates are a
+# scalar or a (loans,) array; a floating rate path is a (1, months) or (loans, months)
+# array of annual percentages.
+def _block_rates(annual_rate, loans, start, stop):
+    rates = monthly_rate(annual_rate)
+    if rates.ndim < 2:
+        return np.broadcast_to(np.reshape(rates, (-1, 1)), (loans, stop - start))
+    return np.broadcast_to(rates[:, start:stop], (loans, stop - start))
+
+
+# Fill one block of months in place, starting from each loan's opening balance.
+# The payment is recast every month from the remaining balance and term, so a fixed
+# rate gives the usual flat EMI and a floating rate re-amortizes after each change.
+# Balances follow B[k+1] = B[k] * (1 + r[k] - a[k]), i.e. a cumulative product.
+def _fill_block(opening, rates, remaining, out: Schedule):
+    factor = _annuity_factor(rates, remaining)
+    growth = np.add(1.0, rates, out=out.interest)
+    np.subtract(growth, factor, out=growth)
+    np.cumprod(growth, axis=1, out=out.balance)
+    np.multiply(out.balance, opening[:, np.newaxis], out=out.balance)
+
+    # Opening balance of each month is the previous month's closing balance
+    np.multiply(factor[:, :1], opening[:, np.newaxis], out=out.payment[:, :1])
+    np.multiply(factor[:, 1:], out.balance[:, :-1], out=out.payment[:, 1:])
+    np.multiply(rates[:, :1], opening[:, np.newaxis], out=out.interest[:, :1])
+    np.multiply(rates[:, 1:], out.balance[:, :-1], out=out.interest[:, 1:])
+    np.subtract(out.payment, out.interest, out=out.principal)
+    # Clean up rounding dust on the final payment
+    np.maximum(out.balance, 0.0, out=out.balance)
+    return out
+
+
+def _allocate(loans, months):
+    return Schedule(*(np.empty((loans, months)) for _ in Schedule._fields))
+
+
+# Full month-by-month schedules for many loans at once, shape (loans, months)
+def schedule(principal, annual_rate, months) -> Schedule:
+    principal = np.atleast_1d(np.asarray(principal, dtype=np.float64))
+    terms = np.broadcast_to(np.asarray(months), principal.shape)
+    horizon = int(terms.max())
+
+    remaining = terms[:, np.newaxis] - np.arange(horizon)[np.newaxis, :]
+    rates = _block_rates(annual_rate, principal.shape[0], 0, horizon)
+    return _fill_block(principal, rates, remaining, _allocate(principal.shape[0], horizon))
+
+
+# Lazy schedules for very long terms: yields (first_month, Schedule) blocks of
+# block_months columns, carrying each loan's balance from one block to the next.
+# The block arrays are reused, so copy anything that must outlive the iteration.
+def iter_schedule(principal, annual_rate, months, block_months: int = 120):
+    principal = np.atleast_1d(np.asarray(principal, dtype=np.float64))
+    terms = np.broadcast_to(np.asarray(months), principal.shape)
+    horizon = int(terms.max())
+    opening = principal.copy()
+    buffer = _allocate(principal.shape[0], block_months)
+
+    for start in range(0, horizon, block_months):
+        stop = min(start + block_months, horizon)
+        out = buffer if stop - start == block_months else _allocate(principal.shape[0], stop - start)
+        remaining = terms[:, np.newaxis] - np.arange(start, stop)[np.newaxis, :]
+        _fill_block(opening, _block_rates(annual_rate, principal.shape[0], start, stop), remaining, out)
+        opening = out.balance[:, -1].copy()
+        yield start, out
+
+
+# EMI as a share of monthly income
+def emi_to_income(principal, annual_rate, months, income):
+    return emi(principal, annual_rate, months) / np.asarray(income, dtype=np.float64)
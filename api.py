@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+import numpy as np
+import orjson
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+import audit
+import instrumentation
+from eligibility import FIELDS, OPTIONAL_FIELDS, check_eligibility_batch, evaluate_applicant, explain_batch, invalid_rows
+from instrumentation import span
+from llm import DEFAULT_MODEL, acached_invoke, acached_stream, get_chain, prompt_inputs, response_cache
+from products import match_products, match_products_batch
+from rules import get_plan
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Upper bound on how long an opt-in LLM explanation may take
+EXPLAIN_TIMEOUT = float(os.getenv("EXPLAIN_TIMEOUT", "20"))
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "100000"))
+
+app = FastAPI(title="Mortgage Eligibility Checker")
+
+
+# Times every request into an "api <method> <route>" histogram and samples slow ones for
+# cProfile. Plain ASGI rather than @app.middleware, which would cost every request even
+# with instrumentation off.
+class RequestTimer:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not instrumentation.enabled:
+            return await self.app(scope, receive, send)
+        # Known routes only, so unmatched paths cannot create unbounded metric names
+        path = scope["path"] if scope["path"] in ROUTE_PATHS else "other"
+        name = f"api {scope['method']} {path}"
+        with instrumentation.profiled(name.replace(" ", "_").replace("/", "_")), span(name):
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(RequestTimer)
+
+
+class Applicant(BaseModel):
+    income: float = Field(ge=0, description="Monthly income in INR")
+    credit_score: int = Field(ge=0, le=900)
+    loan_amount: float = Field(ge=0, description="Desired loan amount in INR")
+    property_value: float = Field(gt=0, description="Property value in INR")
+    interest_rate: Optional[float] = Field(default=None, ge=0, le=100, description="Annual interest rate in percent")
+    tenure_months: Optional[int] = Field(default=None, gt=0, le=600, description="Loan term in months")
+
+
+class ChatTurn(BaseModel):
+    income: Optional[float] = Field(default=None, ge=0)
+    credit_score: Optional[int] = Field(default=None, ge=0, le=900)
+    loan_amount: Optional[float] = Field(default=None, ge=0)
+    property_value: Optional[float] = Field(default=None, gt=0)
+    next_step: str = "get_income"
+
+
+# Ask the LLM to explain a decision without holding up the event loop. None when it
+# times out or fails: the caller still gets the rule result.
+async def llm_explanation(details: dict, failures: int):
+    started = time.perf_counter()
+    try:
+        chain = get_chain(DEFAULT_MODEL, temperature=0)
+        explanation = await asyncio.wait_for(acached_invoke(chain, prompt_inputs(details, "eligibility_check")),
+                                             EXPLAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    except Exception as exc:
+        logger.warning("LLM explanation failed: %s", exc)
+        return None
+    await asyncio.to_thread(audit.record_explanation, details, failures, explanation, DEFAULT_MODEL,
+                            time.perf_counter() - started)
+    return explanation
+
+
+# Audit records are queued from a worker thread, so a full audit queue makes that thread
+# wait rather than the event loop
+@app.post("/eligibility")
+async def eligibility(applicant: Applicant, explain: bool = False):
+    details = applicant.model_dump(exclude_none=True)
+    started = time.perf_counter()
+    with span("eligibility.check"):
+        failures, result = evaluate_applicant(details)
+    await asyncio.to_thread(audit.record_decision, details, failures, latency=time.perf_counter() - started)
+    if explain:
+        result["explanation"] = await llm_explanation(details, failures)
+    return result
+
+
+# Turn a JSON array or NDJSON body into float64 columns, rejecting bad rows
+def parse_batch(body: bytes, ndjson: bool) -> dict:
+    try:
+        if ndjson:
+            rows = [orjson.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = orjson.loads(body)
+    except orjson.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"Malformed JSON: {exc}")
+
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of applicants")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ROWS} applicants per request")
+
+    try:
+        columns = {field: np.fromiter((row[field] for row in rows), dtype=np.float64, count=len(rows)) for field in FIELDS}
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=422, detail=f"Every applicant needs numeric {', '.join(FIELDS)}")
+
+    # Optional loan terms, wherever any row has them; rows without them skip the EMI-to-income rule
+    for field in OPTIONAL_FIELDS:
+        if any(field in row for row in rows):
+            try:
+                columns[field] = np.array([row.get(field) for row in rows], dtype=np.float64)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=422, detail=f"{field} must be numeric")
+
+    invalid = invalid_rows(columns)
+    if invalid.any():
+        raise HTTPException(status_code=422, detail={"invalid_rows": np.flatnonzero(invalid)[:100].tolist()})
+    return columns
+
+
+# Score a JSON array or NDJSON stream of applicants in one vectorized pass
+@app.post("/eligibility/batch")
+async def eligibility_batch(request: Request, explain: bool = False):
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    with span("eligibility.batch_parse"):
+        columns = parse_batch(await request.body(), ndjson)
+    started = time.perf_counter()
+    with span("eligibility.batch"):
+        result = check_eligibility_batch(columns)
+    await asyncio.to_thread(audit.record_batch, columns, result.failures, latency=time.perf_counter() - started)
+
+    response = {
+        "eligible": result.eligible.tolist(),
+        "failures": result.failures.tolist(),
+        "max_loan": result.max_loan.tolist(),
+    }
+    if explain:
+        response["explanations"] = {str(row): reasons for row, reasons in explain_batch(columns, result).items()}
+    # Large column lists serialize much faster through orjson than the default encoder
+    return Response(orjson.dumps(response), media_type="application/json")
+
+
+# Lender products the applicant qualifies for, lowest rate first
+@app.post("/products/match")
+async def products_match(applicant: Applicant, limit: Optional[int] = None):
+    with span("products.match"):
+        products = match_products(applicant.model_dump(exclude_none=True), limit)
+    return {"products": products}
+
+
+# Ranked qualifying product ids for a JSON array or NDJSON stream of applicants
+@app.post("/products/match/batch")
+async def products_match_batch(request: Request, limit: Optional[int] = None):
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    with span("products.batch_parse"):
+        columns = parse_batch(await request.body(), ndjson)
+    with span("products.batch"):
+        matches = match_products_batch(columns, limit)
+    return Response(orjson.dumps({"products": matches}), media_type="application/json")
+
+
+# Server-sent events: one "data" event per token, then a "done" event with timings.
+# The whole reply is audited before the "done" event.
+async def chat_events(details: dict, next_step: str):
+    timings = {}
+    tokens = []
+    started = time.perf_counter()
+    chain = get_chain(DEFAULT_MODEL, temperature=0)
+    async for token in acached_stream(chain, prompt_inputs(details, next_step), timings=timings):
+        tokens.append(token)
+        yield b"data: " + orjson.dumps(token) + b"\n\n"
+    # Details not given yet fail their rules, as in any decision with missing inputs
+    failures = get_plan().evaluate_one({**dict.fromkeys(FIELDS, np.nan), **details})
+    await asyncio.to_thread(audit.record_explanation, details, failures, "".join(tokens), DEFAULT_MODEL,
+                            time.perf_counter() - started)
+    yield b"event: done\ndata: " + orjson.dumps(timings) + b"\n\n"
+
+
+# Stream the assistant's next chat reply token by token
+@app.post("/chat/stream")
+async def chat_stream(turn: ChatTurn):
+    details = turn.model_dump(exclude={"next_step"}, exclude_none=True)
+    return StreamingResponse(chat_events(details, turn.next_step), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# Hit, miss and eviction counters for sizing the LLM response cache
+@app.get("/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
+
+
+# Queue, write and fsync counters for the decision audit log
+@app.get("/audit/stats")
+async def audit_stats():
+    log = audit.get_audit_log()
+    return log.stats() if log is not None else {"enabled": False}
+
+
+# Per-stage latency summaries in Prometheus text format; empty unless INSTRUMENTATION=1
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(instrumentation.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+ROUTE_PATHS = {route.path for route in app.routes}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Each worker is a separate process with its own chain registry, so nothing is shared
+    uvicorn.run("api:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")),
+                workers=int(os.getenv("WEB_CONCURRENCY", "1")), http="httptools", log_level="warning")
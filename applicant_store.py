@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from eligibility import FIELDS, OPTIONAL_FIELDS
+from rules import get_plan
+from solver import DIRECTION
+
+# On-disk columnar store of applicants and their rule outcomes, for ops queries such as
+#   python applicant_store.py query book/ --only credit_score
+#   python applicant_store.py query book/ --near ltv 0.05
+# Each field is a raw fixed-width column file, read through np.memmap without copying.
+# Appends add to the end of the column files and write a new segment holding that
+# batch's indexes, so existing data is never rewritten:
+#   - per rule, the rows sorted by margin (relative slack against the rule's bound,
+#     positive when the rule passes), for range queries by binary search
+#   - rows grouped by failure bitmask, with offsets, for "fails exactly these rules"
+# meta.json is replaced atomically after each append, and bytes past its row count
+# (from an interrupted append) are dropped on the next one. compact() merges the
+# segment indexes once there are many small ones; rebuild() recomputes outcomes and
+# indexes after the rule set changes. A rebuild writes the new failures column and
+# segment first, then records them in meta.json as "pending_rebuild" before swapping
+# them in, so a store reopened after a crash mid-swap finishes the rebuild.
+
+COLUMNS = FIELDS + OPTIONAL_FIELDS
+META = "meta.json"
+# Failure bitmasks are uint8, so there are at most 256 of them
+MASKS = 256
+
+
+# Relative slack of each applicant against each rule's bound: (value - bound) / |bound|
+# for minimums, (bound - value) / |bound| for maximums. NaN where the rule is skipped.
+def margins(plan, columns: dict) -> dict:
+    values = plan.prepare(columns)
+    result = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for rule in plan.rules:
+            bound = rule.threshold if rule.per is None else rule.threshold * values[rule.per]
+            slack = (values[rule.field] - bound) * DIRECTION[rule.op]
+            result[rule.id] = (slack / np.abs(bound)).astype(np.float32)
+    return result
+
+
+class Segment:
+    def __init__(self, path: str, start: int, stop: int):
+        self.path = path
+        self.start = start
+        self.stop = stop
+        self._arrays = {}
+
+    def array(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            array = self._arrays[name] = np.load(os.path.join(self.path, name + ".npy"), mmap_mode="r")
+        return array
+
+
+# Segment files are synced before meta.json can name their segment
+def _save(directory: str, name: str, array: np.ndarray):
+    with open(os.path.join(directory, name + ".npy"), "wb") as file:
+        np.save(file, array)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+# Make a rename in the directory durable
+def _fsync_directory(path: str):
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _new_segment_directory(path: str):
+    # Leftovers of an append or compaction that died before meta.json named this segment
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+# Write one segment's indexes; rows are positions within the segment
+def write_segment(path: str, failures: np.ndarray, rule_margins: dict):
+    _new_segment_directory(path)
+    order = np.argsort(failures, kind="stable").astype(np.uint32)
+    _save(path, "failures.rows", order)
+    offsets = np.searchsorted(failures[order], np.arange(MASKS + 1)).astype(np.uint64)
+    _save(path, "failures.offsets", offsets)
+    for rule_id, margin in rule_margins.items():
+        order = np.argsort(margin, kind="stable")
+        _save(path, f"{rule_id}.margins", margin[order])
+        _save(path, f"{rule_id}.rows", order.astype(np.uint32))
+
+
+# Merge already sorted segment indexes into one segment starting at row 0. The failure
+# groups are concatenated mask by mask; each margin index is a concatenation of sorted
+# runs, which a stable (tim)sort merges in close to linear time.
+def merge_segments(path: str, segments, rule_ids):
+    _new_segment_directory(path)
+    counts = sum(np.diff(segment.array("failures.offsets").astype(np.int64)) for segment in segments)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    rows = np.empty(offsets[-1], dtype=np.uint32)
+    position = offsets[:-1].copy()
+    for segment in segments:
+        segment_rows, segment_offsets = segment.array("failures.rows"), segment.array("failures.offsets")
+        for mask in np.flatnonzero(np.diff(segment_offsets.astype(np.int64))):
+            low, high = int(segment_offsets[mask]), int(segment_offsets[mask + 1])
+            rows[position[mask]:position[mask] + high - low] = segment_rows[low:high] + np.uint32(segment.start)
+            position[mask] += high - low
+    _save(path, "failures.rows", rows)
+    _save(path, "failures.offsets", offsets.astype(np.uint64))
+
+    for rule_id in rule_ids:
+        margin = np.concatenate([segment.array(f"{rule_id}.margins") for segment in segments])
+        rows = np.concatenate([segment.array(f"{rule_id}.rows") + np.uint32(segment.start) for segment in segments])
+        order = np.argsort(margin, kind="stable")
+        _save(path, f"{rule_id}.margins", margin[order])
+        _save(path, f"{rule_id}.rows", rows[order])
+
+
+class ApplicantStore:
+    def __init__(self, path: str, product: str = "default"):
+        self.path = path
+        self.product = product
+        os.makedirs(path, exist_ok=True)
+        self._columns = {}
+        self._segments = []
+        self.meta = self._read_meta()
+        self._open()
+        if "pending_rebuild" in self.meta:
+            self._finish_rebuild()
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(os.path.join(self.path, META)) as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            return {"rows": 0, "product": self.product, "ruleset": None, "segments": [], "next_segment": 0}
+        if meta["product"] != self.product:
+            raise ValueError(f"{self.path} holds {meta['product']!r} outcomes, not {self.product!r}")
+        return meta
+
+    def _write_meta(self, meta: dict):
+        temporary = os.path.join(self.path, META + ".tmp")
+        with open(temporary, "w") as file:
+            json.dump(meta, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, os.path.join(self.path, META))
+        _fsync_directory(self.path)
+        self.meta = meta
+        self._open()
+
+    # Map the first `rows` records of every column and the current segments
+    def _open(self):
+        rows = self.meta["rows"]
+        dtypes = dict.fromkeys(COLUMNS, np.float64)
+        dtypes["failures"] = np.uint8
+        self._columns = {
+            name: np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(rows,)) if rows
+            else np.empty(0, dtype=dtype)
+            for name, dtype in dtypes.items()
+        }
+        self._segments = [Segment(os.path.join(self.path, name), start, stop) for name, start, stop in self.meta["segments"]]
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, name + ".col")
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    # True when the rule set changed since the stored outcomes and margins were computed
+    @property
+    def stale(self) -> bool:
+        return self.meta["ruleset"] is not None and self.meta["ruleset"] != get_plan(self.product).source
+
+    # Append applicants (a dict of arrays or a DataFrame) as a new segment; returns the first new row id
+    def append(self, data) -> int:
+        plan = get_plan(self.product)
+        if self.stale:
+            raise ValueError(f"{self.path} was built with a different rule set; rebuild it before appending")
+        size = len(data[FIELDS[0]])
+        columns = {
+            name: np.asarray(data[name], dtype=np.float64) if name in data else np.full(size, np.nan)
+            for name in COLUMNS
+        }
+        # Missing optional inputs make derived fields NaN, so their rules pass, as in the batch API
+        failures = plan.evaluate({name: column for name, column in columns.items() if name in data})
+        start = self.meta["rows"]
+        if size == 0:
+            return start
+
+        columns["failures"] = failures
+        for name, column in columns.items():
+            with open(self._column_path(name), "ab") as file:
+                # Drop anything an interrupted append left past the committed rows
+                file.truncate(start * column.dtype.itemsize)
+                column.tofile(file)
+                file.flush()
+                os.fsync(file.fileno())
+
+        name = self._next_segment_name()
+        write_segment(os.path.join(self.path, name), failures, margins(plan, columns))
+        self._write_meta({
+            **self.meta,
+            "rows": start + size,
+            "ruleset": plan.source,
+            "segments": self.meta["segments"] + [[name, start, start + size]],
+            "next_segment": self.meta["next_segment"] + 1,
+        })
+        return start
+
+    # Merge every segment's indexes into one; the column files are not touched
+    def compact(self):
+        if len(self._segments) < 2:
+            return
+        name = self._next_segment_name()
+        merge_segments(os.path.join(self.path, name), self._segments, tuple(rule.id for rule in get_plan(self.product).rules))
+        self._replace_segments(name, self.meta["ruleset"])
+
+    # Recompute outcomes and indexes against the current rule set, e.g. after a threshold change
+    def rebuild(self):
+        if not self.meta["rows"]:
+            return
+        plan = get_plan(self.product)
+        columns = {name: self._columns[name] for name in COLUMNS}
+        failures = plan.evaluate(columns)
+        with open(self._column_path("failures") + ".rebuild", "wb") as file:
+            failures.tofile(file)
+            file.flush()
+            os.fsync(file.fileno())
+        name = self._next_segment_name()
+        write_segment(os.path.join(self.path, name), failures, margins(plan, columns))
+        # Commit point: from here on, reopening the store completes the swap
+        self._write_meta({**self.meta, "pending_rebuild": {"segment": name, "ruleset": plan.source}})
+        self._finish_rebuild()
+
+    # Swap in a rebuild's failures column and segment; safe to repeat after a crash
+    def _finish_rebuild(self):
+        pending = self.meta["pending_rebuild"]
+        temporary = self._column_path("failures") + ".rebuild"
+        if os.path.exists(temporary):
+            os.replace(temporary, self._column_path("failures"))
+            _fsync_directory(self.path)
+        meta = {key: value for key, value in self.meta.items() if key != "pending_rebuild"}
+        self.meta = meta
+        self._replace_segments(pending["segment"], pending["ruleset"])
+
+    def _next_segment_name(self) -> str:
+        return f"segment-{self.meta['next_segment']:06d}"
+
+    def _replace_segments(self, name: str, ruleset: str):
+        old = self._segments
+        self._write_meta({
+            **self.meta,
+            "ruleset": ruleset,
+            "segments": [[name, 0, self.meta["rows"]]],
+            "next_segment": self.meta["next_segment"] + 1,
+        })
+        for segment in old:
+            shutil.rmtree(segment.path, ignore_errors=True)
+
+    # Rows whose failure bitmask equals mask ("exact"), includes every bit of it ("all") or any ("any")
+    def with_failures(self, mask: int, match: str = "exact") -> np.ndarray:
+        if match == "exact":
+            masks = [mask]
+        elif match == "all":
+            masks = [value for value in range(MASKS) if value & mask == mask]
+        elif match == "any":
+            masks = [value for value in range(MASKS) if value & mask]
+        else:
+            raise ValueError(f"match must be 'exact', 'all' or 'any', not {match!r}")
+
+        parts = []
+        for segment in self._segments:
+            rows, offsets = segment.array("failures.rows"), segment.array("failures.offsets")
+            for value in masks:
+                low, high = int(offsets[value]), int(offsets[value + 1])
+                if high > low:
+                    parts.append(rows[low:high].astype(np.int64) + segment.start)
+        return _sorted(parts)
+
+    # Rows that fail the given rule and no other, e.g. only_failing("credit_score")
+    def only_failing(self, rule_id: str) -> np.ndarray:
+        return self.with_failures(self._rule(rule_id).bit)
+
+    # Rows whose margin on a rule lies in [low, high]; NaN margins (skipped rules) never match
+    def margin_between(self, rule_id: str, low: float, high: float) -> np.ndarray:
+        self._rule(rule_id)
+        parts = []
+        for segment in self._segments:
+            sorted_margins = segment.array(f"{rule_id}.margins")
+            first = np.searchsorted(sorted_margins, np.float32(low), side="left")
+            last = np.searchsorted(sorted_margins, np.float32(high), side="right")
+            if last > first:
+                parts.append(segment.array(f"{rule_id}.rows")[first:last].astype(np.int64) + segment.start)
+        return _sorted(parts)
+
+    # Rows within `within` (relative) of a rule's bound on either side, e.g. near("ltv", 0.05)
+    def near(self, rule_id: str, within: float) -> np.ndarray:
+        return self.margin_between(rule_id, -within, within)
+
+    # Column values for the given rows, as a dict of arrays
+    def rows(self, ids) -> dict:
+        ids = np.asarray(ids, dtype=np.int64)
+        return {name: np.asarray(column[ids]) for name, column in self._columns.items()}
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def _rule(self, rule_id: str):
+        rule = get_plan(self.product).by_id.get(rule_id)
+        if rule is None:
+            raise KeyError(f"Unknown rule {rule_id!r}")
+        return rule
+
+
+def _sorted(parts) -> np.ndarray:
+    if not parts:
+        return np.empty(0, dtype=np.int64)
+    return np.sort(np.concatenate(parts))
+
+
+def main():
+    from score_cli import read_chunks
+
+    parser = argparse.ArgumentParser(description="Columnar applicant store with indexed rule queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    append = commands.add_parser("append", help="append a CSV or Parquet file of applicants")
+    append.add_argument("store")
+    append.add_argument("input")
+    append.add_argument("--chunk-size", type=int, default=1000000)
+    compact = commands.add_parser("compact", help="merge segment indexes")
+    compact.add_argument("store")
+    rebuild = commands.add_parser("rebuild", help="recompute outcomes and indexes after a rule set change")
+    rebuild.add_argument("store")
+    query = commands.add_parser("query", help="print matching rows as CSV")
+    query.add_argument("store")
+    group = query.add_mutually_exclusive_group(required=True)
+    group.add_argument("--only", metavar="RULE", help="rows failing this rule and no other")
+    group.add_argument("--near", nargs=2, metavar=("RULE", "WITHIN"), help="rows within a relative margin of a rule's bound")
+    group.add_argument("--between", nargs=3, metavar=("RULE", "LOW", "HIGH"), help="rows with a rule margin in [LOW, HIGH]")
+    query.add_argument("--limit", type=int, default=20, help="rows to print; the count is always shown")
+    for command in (append, compact, rebuild, query):
+        command.add_argument("--product", default="default")
+    args = parser.parse_args()
+
+    store = ApplicantStore(args.store, args.product)
+    if args.command == "append":
+        for _, columns in read_chunks(args.input, args.chunk_size):
+            store.append(columns)
+        print(f"{len(store):,} rows in {len(store.meta['segments'])} segments", file=sys.stderr)
+    elif args.command == "compact":
+        store.compact()
+    elif args.command == "rebuild":
+        store.rebuild()
+    else:
+        if args.only:
+            ids = store.only_failing(args.only)
+        elif args.near:
+            ids = store.near(args.near[0], float(args.near[1]))
+        else:
+            ids = store.margin_between(args.between[0], float(args.between[1]), float(args.between[2]))
+        print(f"{len(ids):,} matching rows", file=sys.stderr)
+        values = store.rows(ids[:args.limit])
+        print(",".join(("row",) + tuple(values)))
+        for position, row in enumerate(ids[:args.limit].tolist()):
+            print(",".join([str(row)] + [f"{values[name][position]:g}" for name in values]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+import argparse
+import atexit
+import datetime
+import glob
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+
+from eligibility import FIELDS, OPTIONAL_FIELDS, check_eligibility_batch
+from rules import get_plan
+
+logger = logging.getLogger(__name__)
+
+# Write-behind audit log of eligibility decisions and LLM explanations:
+#   python audit.py dump audit/ --since 2024-06-01 --limit 20
+#   python audit.py replay audit/ --output drifted.jsonl
+# Callers only put a record on a bounded in-memory queue; a background thread drains it
+# in batches and appends each batch to the current segment file as one compressed block.
+# A full queue blocks the caller (backpressure) rather than losing records, unless the
+# log is opened with overflow="drop".
+#
+# Segment files are named by sequence number and never reopened for writing, so a crash
+# can at worst leave a torn last block in the newest one; readers stop at it. Each is
+# created exclusively, so processes sharing a directory (uvicorn --workers) never append
+# to one another's segments. A block is
+#   header: magic, record count, payload bytes, CRC-32 of the payload
+#   payload (zlib): the records as fixed-width rows (RECORD), then the block's string
+#   table (products, models, session ids and explanation texts, each stored once)
+# fsync policy: "always" syncs every block, "interval" at most every fsync_interval
+# seconds (and when the log goes idle), "never" leaves it to the OS. Finished segments
+# are synced unless the policy is "never".
+
+AUDIT_DIR = os.getenv("AUDIT_DIR", "audit")
+AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "interval")
+AUDIT_FSYNC_INTERVAL = float(os.getenv("AUDIT_FSYNC_INTERVAL", "1.0"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+
+FSYNC_POLICIES = ("always", "interval", "never")
+DECISION = 0
+EXPLANATION = 1
+KINDS = ("decision", "explanation")
+
+INPUTS = FIELDS + OPTIONAL_FIELDS
+STRINGS = ("product", "model", "session", "text")
+# String-table index of an absent string
+NONE = 0xFFFFFFFF
+
+# Absent inputs are NaN. A decision is eligible when its failure bitmask is 0.
+RECORD = np.dtype([("time", "<f8")] + [(field, "<f8") for field in INPUTS] + [
+    ("failures", "u1"), ("kind", "u1"), ("latency_ms", "<f4"), ("ruleset", "<u8"),
+] + [(field, "<u4") for field in STRINGS])
+
+MAGIC = b"AUD1"
+BLOCK = struct.Struct("<4sIII")
+SEGMENT_SUFFIX = ".audit"
+
+
+class Segment(NamedTuple):
+    records: np.ndarray
+    strings: list
+
+
+# Queued decisions for a batch of applicants, already laid out as records
+class _Batch(NamedTuple):
+    records: np.ndarray
+    product: str
+
+
+def _segment_paths(directory: str) -> list:
+    return sorted(glob.glob(os.path.join(directory, "*" + SEGMENT_SUFFIX)))
+
+
+# One compressed block for a list of records and their (product, model, session, text) strings
+def encode_block(records: np.ndarray, strings: list, level: int = 6) -> bytes:
+    blobs = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(blobs) + 1, dtype="<u4")
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    payload = zlib.compress(
+        records.tobytes() + struct.pack("<I", len(blobs)) + offsets.tobytes() + b"".join(blobs), level
+    )
+    return BLOCK.pack(MAGIC, len(records), len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_block(header: bytes, payload: bytes) -> Segment:
+    _, count, _, _ = BLOCK.unpack(header)
+    data = zlib.decompress(payload)
+    size = count * RECORD.itemsize
+    records = np.frombuffer(data, RECORD, count)
+    (strings,) = struct.unpack_from("<I", data, size)
+    offsets = np.frombuffer(data, "<u4", strings + 1, size + 4)
+    start = size + 4 + offsets.nbytes
+    text = data[start:]
+    return Segment(records, [text[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(strings)])
+
+
+# Every intact block of a segment file, stopping at a torn or corrupt tail
+def read_blocks(path: str):
+    with open(path, "rb") as file:
+        while True:
+            header = file.read(BLOCK.size)
+            if not header:
+                return
+            if len(header) < BLOCK.size:
+                logger.warning("%s: torn block header, ignoring the rest", path)
+                return
+            magic, _, length, crc = BLOCK.unpack(header)
+            payload = file.read(length)
+            if magic != MAGIC or len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning("%s: torn or corrupt block, ignoring the rest", path)
+                return
+            yield decode_block(header, payload)
+
+
+# All records of one segment file, with the blocks' string tables merged into one
+def read_segment(path: str) -> Segment:
+    strings = []
+    interned = {}
+    parts = []
+    for block in read_blocks(path):
+        for value in block.strings:
+            if value not in interned:
+                interned[value] = len(strings)
+                strings.append(value)
+        remap = np.array([interned[value] for value in block.strings] + [NONE], dtype="<u4")
+        records = block.records.copy()
+        for field in STRINGS:
+            records[field] = remap[np.minimum(records[field], len(block.strings))]
+        parts.append(records)
+    records = np.concatenate(parts) if parts else np.empty(0, RECORD)
+    return Segment(records, strings)
+
+
+# Segments of an audit directory, oldest first, filtered to since <= time < until
+def read_log(directory: str, since: float = None, until: float = None):
+    for path in _segment_paths(directory):
+        segment = read_segment(path)
+        keep = np.ones(len(segment.records), dtype=bool)
+        if since is not None:
+            keep &= segment.records["time"] >= since
+        if until is not None:
+            keep &= segment.records["time"] < until
+        if keep.any():
+            yield Segment(segment.records[keep], segment.strings)
+
+
+# Plain dicts for records, e.g. for JSON output
+def to_dicts(segment: Segment, records: np.ndarray = None) -> list:
+    records = segment.records if records is None else records
+    rows = []
+    for record in records:
+        row = {"time": float(record["time"]), "kind": KINDS[record["kind"]]}
+        row.update((field, float(record[field])) for field in INPUTS if not np.isnan(record[field]))
+        row.update(failures=int(record["failures"]), latency_ms=round(float(record["latency_ms"]), 3),
+                   ruleset=f"{int(record['ruleset']):016x}")
+        row.update((field, segment.strings[record[field]]) for field in STRINGS if record[field] != NONE)
+        rows.append(row)
+    return rows
+
+
+class AuditLog:
+    def __init__(self, directory: str = AUDIT_DIR, fsync: str = AUDIT_FSYNC,
+                 fsync_interval: float = AUDIT_FSYNC_INTERVAL, max_queue: int = AUDIT_QUEUE_SIZE,
+                 batch_size: int = 4096, linger: float = 0.05, segment_bytes: int = 64 << 20, level: int = 6,
+                 overflow: str = "block"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, not {fsync!r}")
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"overflow must be 'block' or 'drop', not {overflow!r}")
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.linger = linger
+        self.segment_bytes = segment_bytes
+        self.level = level
+        self.overflow = overflow
+        os.makedirs(directory, exist_ok=True)
+        paths = _segment_paths(directory)
+        # Always start a new segment: an existing one may end in a torn block
+        self._sequence = int(os.path.basename(paths[-1])[:-len(SEGMENT_SUFFIX)]) + 1 if paths else 0
+        self._file = None
+        self._dirty = False
+        self._synced = time.monotonic()
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.written = 0
+        self.blocks = 0
+        self.bytes = 0
+        self.fsyncs = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.errors = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        if self._closed:
+            raise RuntimeError("audit log is closed")
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.overflow == "drop":
+                with self._lock:
+                    self.dropped += 1
+                    first = self.dropped == 1
+                if first:
+                    logger.warning("audit queue full; dropping records")
+                return
+            with self._lock:
+                self.blocked += 1
+            self._queue.put(item)
+        with self._lock:
+            self.queued += len(item.records) if isinstance(item, _Batch) else 1
+
+    def record_decision(self, details: dict, failures: int, product: str = "default", latency: float = 0.0,
+                        session: str = None, ruleset: int = 0):
+        self._put((time.time(), *(float(details.get(field, np.nan)) for field in INPUTS), failures, DECISION,
+                   latency * 1000, ruleset, product, None, session, None))
+
+    def record_explanation(self, details: dict, failures: int, text: str, model: str, latency: float = 0.0,
+                           product: str = "default", session: str = None, ruleset: int = 0):
+        self._put((time.time(), *(float(details.get(field, np.nan)) for field in INPUTS), failures, EXPLANATION,
+                   latency * 1000, ruleset, product, model, session, text))
+
+    # Decisions for a whole batch of applicants: columns of inputs and their failure bitmasks
+    def record_batch(self, columns: dict, failures: np.ndarray, product: str = "default", latency: float = 0.0,
+                     ruleset: int = 0):
+        records = np.empty(len(failures), RECORD)
+        records["time"] = time.time()
+        for field in INPUTS:
+            records[field] = columns[field] if field in columns else np.nan
+        records["failures"] = failures
+        records["kind"] = DECISION
+        # The batch's latency, shared by its applicants
+        records["latency_ms"] = latency * 1000 / max(1, len(failures))
+        records["ruleset"] = ruleset
+        for field in STRINGS:
+            records[field] = NONE
+        self._put(_Batch(records, product))
+
+    # Encode queued items into records plus one string table
+    def _encode(self, items) -> tuple:
+        strings = {}
+
+        def intern(value):
+            return NONE if value is None else strings.setdefault(value, len(strings))
+
+        rows = []
+        arrays = []
+        # Records keep queue order: pending single rows are flushed before each batch
+        for item in items:
+            if isinstance(item, _Batch):
+                if rows:
+                    arrays.append(np.array(rows, dtype=RECORD))
+                    rows = []
+                item.records["product"] = intern(item.product)
+                arrays.append(item.records)
+            else:
+                rows.append(item[:-4] + tuple(intern(value) for value in item[-4:]))
+        if rows:
+            arrays.append(np.array(rows, dtype=RECORD))
+        records = arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+        return encode_block(records, list(strings), self.level), len(records)
+
+    # A new segment under the next free sequence number; another process may have taken ours
+    def _open_segment(self):
+        while True:
+            path = os.path.join(self.directory, f"{self._sequence:08d}{SEGMENT_SUFFIX}")
+            self._sequence += 1
+            try:
+                self._file = open(path, "xb", buffering=0)
+                return
+            except FileExistsError:
+                continue
+
+    def _sync(self):
+        if self._file is not None and self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self.fsyncs += 1
+        self._synced = time.monotonic()
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        if self.fsync != "never":
+            self._sync()
+        self._file.close()
+        self._file = None
+
+    def _write(self, items):
+        data, count = self._encode(items)
+        if self._file is None:
+            self._open_segment()
+        self._file.write(data)
+        self._dirty = True
+        with self._lock:
+            self.written += count
+            self.blocks += 1
+            self.bytes += len(data)
+        if self.fsync == "always" or (self.fsync == "interval" and
+                                      time.monotonic() - self._synced >= self.fsync_interval):
+            self._sync()
+        if self._file.tell() >= self.segment_bytes:
+            self._close_segment()
+
+    def _run(self):
+        while True:
+            # With unsynced data, wake up in time to sync it even if nothing else arrives
+            timeout = None
+            if self.fsync == "interval" and self._dirty:
+                timeout = max(0.0, self._synced + self.fsync_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._sync()
+                continue
+
+            items = [item]
+            deadline = time.monotonic() + self.linger
+            while item is not None and len(items) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                items.append(item)
+
+            stop = items[-1] is None
+            records = items[:-1] if stop else items
+            try:
+                if records:
+                    self._write(records)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                logger.exception("failed to write %d audit records", len(records))
+            for _ in items:
+                self._queue.task_done()
+            if stop:
+                self._close_segment()
+                return
+
+    # Wait until everything queued so far has been written
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "written": self.written,
+                "pending": self._queue.qsize(),
+                "blocks": self.blocks,
+                "bytes": self.bytes,
+                "bytes_per_record": self.bytes / self.written if self.written else 0.0,
+                "fsyncs": self.fsyncs,
+                "blocked": self.blocked,
+                "dropped": self.dropped,
+                "errors": self.errors,
+            }
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+# The process-wide audit log in AUDIT_DIR, opened on first use; None when AUDIT_DIR is empty
+def get_audit_log():
+    global _log
+    if _log is None and AUDIT_DIR:
+        with _log_lock:
+            if _log is None:
+                _log = AuditLog(AUDIT_DIR)
+                atexit.register(_log.close)
+    return _log
+
+
+# Replace the process-wide log (e.g. with one in a temporary directory); returns the previous one
+def set_audit_log(log):
+    global _log
+    with _log_lock:
+        previous, _log = _log, log
+    return previous
+
+
+def record_decision(details: dict, failures: int, product: str = "default", latency: float = 0.0,
+                    session: str = None):
+    log = get_audit_log()
+    if log is not None:
+        log.record_decision(details, failures, product, latency, session, get_plan(product).fingerprint)
+
+
+def record_explanation(details: dict, failures: int, text: str, model: str, latency: float = 0.0,
+                       product: str = "default", session: str = None):
+    log = get_audit_log()
+    if log is not None:
+        log.record_explanation(details, failures, text, model, latency, product, session,
+                               get_plan(product).fingerprint)
+
+
+def record_batch(columns: dict, failures: np.ndarray, product: str = "default", latency: float = 0.0):
+    log = get_audit_log()
+    if log is not None:
+        log.record_batch(columns, failures, product, latency, get_plan(product).fingerprint)
+
+
+class Drift(NamedTuple):
+    decisions: int
+    drifted: int
+    newly_eligible: int
+    newly_ineligible: int
+    # rule id -> (now failing, now passing) counts
+    rules: dict
+    # ruleset fingerprint -> (decisions, drifted)
+    rulesets: dict
+    unknown_products: dict
+
+
+# Re-run historical decisions against the current rules, one vectorized pass per product
+# and segment; on_drift(segment, records, new_failures) sees the records whose outcome changed
+def replay(directory: str, since: float = None, until: float = None, on_drift=None) -> Drift:
+    decisions = drifted = newly_eligible = newly_ineligible = 0
+    rules = {}
+    rulesets = {}
+    unknown = {}
+    for segment in read_log(directory, since, until):
+        records = segment.records[segment.records["kind"] == DECISION]
+        for code in np.unique(records["product"]):
+            product = segment.strings[code] if code != NONE else "default"
+            group = records[records["product"] == code]
+            try:
+                plan = get_plan(product)
+            except Exception:
+                unknown[product] = unknown.get(product, 0) + len(group)
+                continue
+            columns = {field: group[field] for field in INPUTS}
+            failures = check_eligibility_batch(columns, product).failures
+            old = group["failures"]
+            changed = failures != old
+            decisions += len(group)
+            drifted += int(changed.sum())
+            newly_eligible += int(((failures == 0) & (old != 0)).sum())
+            newly_ineligible += int(((failures != 0) & (old == 0)).sum())
+            for rule in plan.rules:
+                now_failing = int(((failures & rule.bit) & ~(old & rule.bit)).astype(bool).sum())
+                now_passing = int(((old & rule.bit) & ~(failures & rule.bit)).astype(bool).sum())
+                failing, passing = rules.get(rule.id, (0, 0))
+                rules[rule.id] = (failing + now_failing, passing + now_passing)
+            fingerprints, counts = np.unique(group["ruleset"], return_counts=True)
+            for fingerprint, count in zip(fingerprints.tolist(), counts.tolist()):
+                key = f"{fingerprint:016x}"
+                total, changes = rulesets.get(key, (0, 0))
+                rulesets[key] = (total + count, changes + int(changed[group["ruleset"] == fingerprint].sum()))
+            if on_drift is not None and changed.any():
+                on_drift(segment, group[changed], failures[changed])
+    return Drift(decisions, drifted, newly_eligible, newly_ineligible, rules, rulesets, unknown)
+
+
+# Epoch seconds or an ISO date/time
+def parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.astimezone()
+        return moment.timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read and replay the eligibility audit log")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("dump", "replay", "stats"):
+        command = commands.add_parser(name)
+        command.add_argument("directory", nargs="?", default=AUDIT_DIR or "audit")
+        command.add_argument("--since", type=parse_time, help="epoch seconds or ISO date/time")
+        command.add_argument("--until", type=parse_time, help="epoch seconds or ISO date/time")
+    commands.choices["dump"].add_argument("--kind", choices=KINDS)
+    commands.choices["dump"].add_argument("--limit", type=int)
+    commands.choices["replay"].add_argument("--output", help="JSON lines file for the decisions that changed")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "dump":
+        remaining = args.limit
+        for segment in read_log(args.directory, args.since, args.until):
+            records = segment.records
+            if args.kind:
+                records = records[records["kind"] == KINDS.index(args.kind)]
+            if remaining is not None:
+                records = records[:remaining]
+                remaining -= len(records)
+            for row in to_dicts(segment, records):
+                print(json.dumps(row))
+            if remaining == 0:
+                break
+    elif args.command == "stats":
+        counts = np.zeros(len(KINDS), dtype=np.int64)
+        ineligible = 0
+        first, last = np.inf, -np.inf
+        for segment in read_log(args.directory, args.since, args.until):
+            records = segment.records
+            counts += np.bincount(records["kind"], minlength=len(KINDS))
+            ineligible += int(((records["kind"] == DECISION) & (records["failures"] != 0)).sum())
+            first = min(first, records["time"].min())
+            last = max(last, records["time"].max())
+        print(json.dumps({
+            "segments": len(_segment_paths(args.directory)),
+            **dict(zip(KINDS, counts.tolist())),
+            "ineligible": ineligible,
+            "first": datetime.datetime.fromtimestamp(first).isoformat() if np.isfinite(first) else None,
+            "last": datetime.datetime.fromtimestamp(last).isoformat() if np.isfinite(last) else None,
+            "seconds": round(time.perf_counter() - started, 3),
+        }, indent=2))
+    else:
+        output = open(args.output, "w", encoding="utf-8") if args.output else None
+
+        def on_drift(segment, records, failures):
+            for row, now in zip(to_dicts(segment, records), failures.tolist()):
+                row["replayed_failures"] = now
+                output.write(json.dumps(row) + "\n")
+
+        try:
+            drift = replay(args.directory, args.since, args.until, on_drift if output else None)
+        finally:
+            if output:
+                output.close()
+        report = drift._asdict()
+        report["rules"] = {rule: {"now_failing": failing, "now_passing": passing}
+                           for rule, (failing, passing) in drift.rules.items()}
+        report["rulesets"] = {fingerprint: {"decisions": total, "drifted": changes}
+                              for fingerprint, (total, changes) in drift.rulesets.items()}
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        print(json.dumps(report, indent=2))
+        if drift.drifted:
+            print(f"{drift.drifted:,} of {drift.decisions:,} decisions differ under the current rules", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
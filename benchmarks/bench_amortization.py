@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import numpy as np
+
+import amortization
+from eligibility import check_eligibility_batch
+
+# EMI, full schedules and the lazy schedule generator on many 30-year loans.
+# Run from the repository root: python -m benchmarks.bench_amortization
+
+
+def timed(name, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{name:<46} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EMI and amortization schedules")
+    parser.add_argument("--loans", type=int, default=100000)
+    parser.add_argument("--months", type=int, default=360)
+    parser.add_argument("--chunk", type=int, default=10000, help="loans per full-schedule chunk")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    principal = rng.uniform(1e5, 5e6, args.loans)
+    rates = rng.uniform(6.5, 11.0, args.loans)
+    income = rng.uniform(2e4, 3e5, args.loans)
+
+    timed(f"EMI for {args.loans} loans", lambda: amortization.emi(principal, rates, args.months))
+    timed(f"EMI-to-income rule on {args.loans} applicants", lambda: check_eligibility_batch({
+        "income": income, "credit_score": np.full(args.loans, 720), "loan_amount": principal,
+        "property_value": principal * 1.5, "interest_rate": rates, "tenure_months": np.full(args.loans, args.months),
+    }))
+
+    def full_schedules():
+        interest = 0.0
+        for start in range(0, args.loans, args.chunk):
+            stop = start + args.chunk
+            interest += amortization.schedule(principal[start:stop], rates[start:stop], args.months).interest.sum()
+        return interest
+
+    def lazy_schedules():
+        interest = 0.0
+        for _, block in amortization.iter_schedule(principal, rates, args.months, block_months=12):
+            interest += block.interest.sum()
+        return interest
+
+    # A floating path: every loan resets 150 bps higher after five years
+    path = np.where(np.arange(args.months) < 60, 0.0, 1.5)[np.newaxis, :] + rates[:, np.newaxis]
+
+    def floating_schedules():
+        interest = 0.0
+        for start in range(0, args.loans, args.chunk):
+            stop = start + args.chunk
+            interest += amortization.schedule(principal[start:stop], path[start:stop], args.months).interest.sum()
+        return interest
+
+    eager = timed(f"full schedules, {args.chunk}-loan chunks", full_schedules)
+    lazy = timed("lazy generator, 12-month blocks", lazy_schedules)
+    timed(f"floating-rate schedules, {args.chunk}-loan chunks", floating_schedules)
+    assert np.isclose(eager, lazy), (eager, lazy)
+    print(f"{args.loans * args.months / 1e6:.1f}M loan-months per schedule run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from applicant_store import ApplicantStore
+from eligibility import FAIL_CREDIT_SCORE, check_eligibility_batch, check_mortgage_eligibility
+
+# Ops-style queries ("fails only on credit score", "within 5% of the LTV cap") over a
+# large book: the indexed columnar store against a vectorized scan of every row and the
+# old per-applicant loop (timed on a sample and scaled up).
+# Run from the repository root: python -m benchmarks.bench_applicant_store --rows 20000000
+
+
+def applicants(rng, count):
+    return {
+        "income": rng.uniform(10000, 90000, count),
+        "credit_score": rng.integers(450, 850, count).astype(np.float64),
+        "loan_amount": rng.uniform(1e5, 2e6, count),
+        "property_value": rng.uniform(2e5, 2.5e6, count),
+    }
+
+
+def timed(function, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def scan_only_credit(store):
+    columns = {name: store.column(name) for name in ("income", "credit_score", "loan_amount", "property_value")}
+    return np.flatnonzero(check_eligibility_batch(columns).failures == FAIL_CREDIT_SCORE)
+
+
+def scan_near_ltv(store, within):
+    cap = 0.8 * store.column("property_value")
+    return np.flatnonzero(np.abs((cap - store.column("loan_amount")) / cap) <= within)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure indexed applicant store queries")
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--chunk-size", type=int, default=1000000)
+    parser.add_argument("--loop-sample", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    directory = tempfile.mkdtemp(prefix="applicant-store-")
+    try:
+        store = ApplicantStore(directory)
+        started = time.perf_counter()
+        for start in range(0, args.rows, args.chunk_size):
+            store.append(applicants(rng, min(args.chunk_size, args.rows - start)))
+        elapsed = time.perf_counter() - started
+        print(f"append: {args.rows:,} rows in {len(store.meta['segments'])} segments, "
+              f"{elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/sec)")
+
+        sample = store.rows(np.arange(min(args.loop_sample, args.rows)))
+        details = [{name: float(sample[name][row]) for name in ("income", "credit_score", "loan_amount", "property_value")}
+                   for row in range(len(sample["income"]))]
+        _, loop = timed(lambda: [check_mortgage_eligibility(applicant) for applicant in details], repeat=1)
+        print(f"per-applicant loop: {loop / len(details) * args.rows:.1f}s for every row (scaled from {len(details):,})")
+
+        queries = [
+            ("fails only credit_score", lambda: store.only_failing("credit_score"), lambda: scan_only_credit(store)),
+            ("within 5% of the LTV cap", lambda: store.near("ltv", 0.05), lambda: scan_near_ltv(store, 0.05)),
+            ("within 0.1% of the LTV cap", lambda: store.near("ltv", 0.001), lambda: scan_near_ltv(store, 0.001)),
+        ]
+        for label in ("segmented", "compacted"):
+            if label == "compacted":
+                _, seconds = timed(store.compact, repeat=1)
+                print(f"compact: {seconds:.1f}s")
+            for name, indexed, scan in queries:
+                rows, indexed_seconds = timed(indexed)
+                expected, scan_seconds = timed(scan, repeat=2)
+                # Margins are float32 in the index, so rows sitting exactly on the edge may differ
+                mismatched = len(np.setxor1d(rows, expected))
+                print(f"{label:>10} {name:<28} {len(rows):>10,} rows  index {indexed_seconds * 1000:8.1f} ms  "
+                      f"scan {scan_seconds * 1000:8.1f} ms  mismatched {mismatched}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import statistics
+import time
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_groq import ChatGroq
+
+from benchmarks.stub_llm import start_stub_server
+from llm import DEFAULT_MODEL, PROMPT_TEMPLATE, clear_chains, get_chain, prompt_inputs
+
+# Per-turn latency of rebuilding the chain on every call versus the shared registry.
+# Run from the repository root: python -m benchmarks.bench_chain_reuse
+
+DETAILS = {"income": 45000.0, "credit_score": 700, "loan_amount": 600000.0, "property_value": 900000.0}
+
+
+# The pre-registry behaviour: parse the template and create a client for every turn
+def rebuild_every_call(base_url):
+    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    llm = ChatGroq(model=DEFAULT_MODEL, temperature=0, api_key=os.environ["GROQ_API_KEY"], base_url=base_url)
+    chain = prompt | llm | StrOutputParser()
+    return chain.invoke(prompt_inputs(DETAILS, "get_property_value"))
+
+
+def registry(base_url):
+    return get_chain(DEFAULT_MODEL, 0, base_url).invoke(prompt_inputs(DETAILS, "get_property_value"))
+
+
+def measure(turn, base_url, turns):
+    turn(base_url)
+    timings = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        turn(base_url)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-turn chain latency against a stub LLM")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub server latency in seconds")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "stub-key")
+    server, base_url = start_stub_server(latency=args.latency)
+    try:
+        clear_chains()
+        for name, turn in (("rebuild every call", rebuild_every_call), ("shared registry", registry)):
+            stats = measure(turn, base_url, args.turns)
+            print(f"{name:<20} mean {stats['mean_ms']:.2f} ms  p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import time
+import tracemalloc
+
+from chat_messages import AIMessage, HumanMessage
+from conversation import PAGE_SIZE, Conversation, approx_tokens, prompt_context, render_page
+from llm import PROMPT_TEMPLATE, prompt_inputs
+
+# Prompt tokens, render time and memory per turn as a conversation grows, for the
+# bounded Conversation versus the old unbounded list that put and rendered everything.
+# Run from the repository root: python -m benchmarks.bench_context
+
+DETAILS = {"income": 45000.0, "credit_score": 700, "loan_amount": 600000.0, "property_value": 900000.0}
+
+
+# Stand-in for st.chat_message + st.markdown: formats the message the way the UI would
+def render(message):
+    return f"<div class='{message.type}'>{message.content}</div>"
+
+
+def unbounded_prompt(messages) -> str:
+    history = "\n    ".join(f"{'Assistant' if m.type == 'ai' else 'User'}: {m.content}" for m in messages)
+    return PROMPT_TEMPLATE.format(**prompt_inputs(DETAILS, "eligibility_check", {"history": history}))
+
+
+def bounded_prompt(conversation) -> str:
+    return PROMPT_TEMPLATE.format(**prompt_inputs(DETAILS, "eligibility_check", prompt_context(conversation, DETAILS)))
+
+
+def measure(history, prompt, visible, turns):
+    tracemalloc.start()
+    rows = {}
+    for turn in range(1, turns + 1):
+        history.append(HumanMessage(content=f"Question {turn}: what about a fixed rate over twenty years instead?"))
+        history.append(AIMessage(content=f"Answer {turn}: " + "a fixed rate keeps the EMI steady for the whole term. " * 3))
+        if turn in (10, 100, 1000, 10000) or turn == turns:
+            started = time.perf_counter()
+            tokens = approx_tokens(prompt(history))
+            render_ms = render_page(history, visible(history), render)
+            prompt_ms = (time.perf_counter() - started) * 1000 - render_ms
+            rows[turn] = (tokens, prompt_ms, render_ms, tracemalloc.get_traced_memory()[0] / 1024)
+    tracemalloc.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show prompt size and render time stay flat as a conversation grows")
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {
+        "unbounded list": measure(Conversation(max_messages=None), unbounded_prompt, len, args.turns),
+        "Conversation": measure(Conversation(), bounded_prompt, lambda history: PAGE_SIZE, args.turns),
+    }
+    print(f"{'':<16}{'turn':>7}{'prompt tokens':>15}{'prompt ms':>11}{'render ms':>11}{'memory KiB':>12}")
+    for name, rows in results.items():
+        for turn, (tokens, prompt_ms, render_ms, memory) in rows.items():
+            print(f"{name:<16}{turn:>7}{tokens:>15,}{prompt_ms:>11.2f}{render_ms:>11.2f}{memory:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
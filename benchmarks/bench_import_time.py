@@ -0,0 +1,83 @@
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start guard for the Streamlit entry points. Collects the top-level imports of
+# app.py, ap.py and appp.py (minus Streamlit itself), imports them in a fresh
+# interpreter under `python -X importtime`, and exits non-zero if the LLM stack is
+# pulled in eagerly or the median cold import exceeds --budget-ms.
+# Run from the repository root: python -m benchmarks.bench_import_time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ("app.py", "ap.py", "appp.py")
+# The UI runtime is imported either way; what we guard is everything the apps add on top
+IGNORED = {"streamlit"}
+# Must only load on the first LLM call
+LAZY_MODULES = ("langchain", "langchain_core", "langchain_groq", "groq", "httpx")
+
+
+def entry_point_imports() -> list:
+    modules = []
+    for name in ENTRY_POINTS:
+        with open(os.path.join(ROOT, name), encoding="utf-8") as file:
+            tree = ast.parse(file.read())
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                modules += [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                modules.append(node.module)
+    return [module for module in dict.fromkeys(modules) if module.split(".")[0] not in IGNORED]
+
+
+# One cold interpreter: returns (total import microseconds, every module imported)
+def measure(modules) -> tuple:
+    code = "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total = 0
+    imported = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level entries have no indentation in the package column
+        if not name.startswith("  "):
+            total += int(cumulative)
+        imported.append(name.strip())
+    return total, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when the Streamlit apps' cold import regresses")
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    modules = entry_point_imports()
+    timings = []
+    for _ in range(args.runs):
+        total, imported = measure(modules)
+        timings.append(total / 1000)
+    median = statistics.median(timings)
+
+    print(f"Entry point imports: {', '.join(modules)}")
+    print(f"Cold import over {args.runs} runs: median {median:.1f} ms, min {min(timings):.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    eager = sorted({name for name in imported if name.split(".")[0] in LAZY_MODULES})
+    failed = False
+    if eager:
+        print(f"FAIL: LLM stack imported at start-up: {', '.join(eager[:10])}")
+        failed = True
+    if median > args.budget_ms:
+        print("FAIL: cold import is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
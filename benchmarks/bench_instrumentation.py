@@ -0,0 +1,54 @@
+import argparse
+import random
+import timeit
+
+import instrumentation
+from eligibility import check_mortgage_eligibility
+
+# Overhead of a span when instrumentation is off and on, next to the eligibility check it
+# would wrap, and how close the histogram's quantiles are to the exact ones.
+# Run from the repository root: python -m benchmarks.bench_instrumentation
+
+DETAILS = {"income": 45000.0, "credit_score": 700, "loan_amount": 600000.0, "property_value": 900000.0}
+
+
+def check():
+    return check_mortgage_eligibility(DETAILS)
+
+
+def spanned_check():
+    with instrumentation.span("eligibility.check"):
+        return check_mortgage_eligibility(DETAILS)
+
+
+def ns_per_call(function, number):
+    return timeit.timeit(function, number=number) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure span overhead and histogram accuracy")
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    baseline = ns_per_call(check, args.calls)
+    instrumentation.disable()
+    disabled = ns_per_call(spanned_check, args.calls)
+    instrumentation.enable()
+    enabled = ns_per_call(spanned_check, args.calls)
+    print(f"check_mortgage_eligibility        {baseline:8.0f} ns")
+    print(f"  inside a span, disabled         {disabled:8.0f} ns (+{disabled - baseline:.0f})")
+    print(f"  inside a span, enabled          {enabled:8.0f} ns (+{enabled - baseline:.0f})")
+
+    # Heavy-tailed latencies in microseconds, like LLM calls
+    values = sorted(int(random.lognormvariate(12, 0.8)) for _ in range(200000))
+    histogram = instrumentation.Histogram()
+    for value in values:
+        histogram.record(value)
+    for q in instrumentation.QUANTILES:
+        exact = values[min(int(q * len(values)), len(values) - 1)]
+        estimate = histogram.quantile(q)
+        print(f"p{q * 100:<5g} exact {exact / 1000:9.1f} ms  histogram {estimate / 1000:9.1f} ms  ({(estimate - exact) / exact:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
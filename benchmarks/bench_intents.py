@@ -0,0 +1,90 @@
+import argparse
+import os
+import time
+
+import intents
+from benchmarks.stub_llm import start_stub_server
+from eligibility import check_mortgage_eligibility
+from llm import DEFAULT_MODEL, cached_invoke, get_chain, prompt_inputs, response_cache
+
+# Share of chat turns the local intent router answers without the LLM, and the latency
+# that saves against a stub Groq server with a realistic round-trip time.
+# Run from the repository root: python -m benchmarks.bench_intents
+
+DETAILS = {"income": 25000.0, "credit_score": 600, "loan_amount": 900000.0, "property_value": 1000000.0}
+
+# (message, expected intent); None means the turn should reach the LLM
+TURNS = [
+    ("1000000", "verdict"),
+    ("Check eligibility", "verdict"),
+    ("am I eligible now?", "verdict"),
+    ("what's the result?", "verdict"),
+    ("Why am I ineligible?", "reasons"),
+    ("why", "reasons"),
+    ("can you explain that", "reasons"),
+    ("what went wrong?", "reasons"),
+    ("suggest", "suggestions"),
+    ("how do I improve", "suggestions"),
+    ("any tips?", "suggestions"),
+    ("what can I do to qualify", "suggestions"),
+    ("what's my max loan", "max_loan"),
+    ("how much can I borrow?", "max_loan"),
+    ("what loan can I afford", "max_loan"),
+    ("what would my EMI be", "emi"),
+    ("show me my details", "details"),
+    ("hi", "greeting"),
+    ("thanks!", "thanks"),
+    ("ok great", "thanks"),
+    ("what is a fixed rate mortgage?", None),
+    ("what's the difference between fixed and floating rates", None),
+    ("how does a balance transfer work", None),
+    ("can I add my spouse as a co-applicant?", None),
+    ("tell me about prepayment penalties", None),
+    ("do you cover plots of land outside the city", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how many chat turns skip the LLM")
+    parser.add_argument("--latency", type=float, default=0.35, help="stub LLM round-trip in seconds")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    wrong = [(message, expected, intents.classify(message)) for message, expected in TURNS
+             if intents.classify(message) != expected]
+    for message, expected, actual in wrong:
+        print(f"misrouted: {message!r} expected {expected} got {actual}")
+    print(f"Routing accuracy: {1 - len(wrong) / len(TURNS):.0%} on {len(TURNS)} labelled turns")
+
+    messages = [message for message, _ in TURNS]
+    rounds = 2000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            intents.classify(message)
+    print(f"classify: {(time.perf_counter() - start) / (rounds * len(messages)) * 1e6:.1f} µs/message")
+
+    os.environ.setdefault("GROQ_API_KEY", "stub-key")
+    server, base_url = start_stub_server(latency=args.latency)
+    try:
+        chain = get_chain(DEFAULT_MODEL, 0, base_url)
+        eligibility_info = check_mortgage_eligibility(DETAILS)
+        for _ in range(args.rounds):
+            for message in messages:
+                # Keep the response cache out of the measurement
+                response_cache.clear()
+                intents.respond(message, DETAILS, eligibility_info,
+                                lambda: cached_invoke(chain, prompt_inputs(DETAILS, "eligibility_check")))
+    finally:
+        server.shutdown()
+
+    stats = intents.stats.stats()
+    print(
+        f"{stats['turns']} turns: {stats['local_fraction']:.0%} answered locally "
+        f"({stats['mean_local_ms']:.3f} ms) vs LLM ({stats['mean_remote_ms']:.1f} ms); "
+        f"saved {stats['saved_ms'] / 1000:.1f} s, {stats['saved_ms'] / stats['turns']:.0f} ms per turn"
+    )
+
+
+if __name__ == "__main__":
+    main()
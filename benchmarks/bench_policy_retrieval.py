@@ -0,0 +1,114 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from policy_docs import EmbeddingCache, PolicyIndex, chunk_text, ingest, load_embedder
+
+# Policy retrieval offline: ingestion throughput cold, re-run unchanged (every chunk from
+# the embedding cache) and after editing one page, then query latency under the budget.
+# Documents are synthetic text pages, so no PDFs, model downloads or network are needed;
+# pass --model with a downloaded sentence-transformers model to time real embeddings.
+# Run from the repository root: python -m benchmarks.bench_policy_retrieval
+
+TOPICS = {
+    "loan to value": "The loan amount must not exceed {n}% of the assessed property value for {kind} properties.",
+    "credit score": "Applicants need a credit score of at least {n} to qualify for the {kind} product.",
+    "income": "Minimum net monthly income is {n} thousand INR for {kind} borrowers, verified by salary slips.",
+    "emi": "The EMI on all loans together may not exceed {n}% of monthly income for {kind} applicants.",
+    "tenure": "Loan tenure may extend to {n} years, ending before the {kind} borrower turns seventy.",
+    "prepayment": "Floating rate loans carry no prepayment charge; fixed rate {kind} loans charge {n}% of the amount prepaid.",
+    "co-applicant": "A co-applicant's income counts towards eligibility when they are a {kind} family member, up to {n}%.",
+    "documents": "Self-employed {kind} applicants submit {n} years of audited accounts and income tax returns.",
+}
+KINDS = ("salaried", "self-employed", "resale", "under-construction", "NRI", "first-time", "joint", "senior")
+QUESTIONS = (
+    "what loan to value is allowed for resale flats",
+    "minimum credit score for the NRI product",
+    "can I include my spouse as a co-applicant",
+    "is there a prepayment penalty on fixed rate loans",
+    "how long can the loan tenure be",
+    "what documents do self-employed applicants need",
+    "what share of income can go to EMIs",
+    "minimum income for salaried borrowers",
+)
+
+
+def page_text(rng, words_per_page):
+    sentences = []
+    while sum(len(sentence.split()) for sentence in sentences) < words_per_page:
+        topic = rng.choice(list(TOPICS))
+        sentences.append(f"{topic.title()}. " + TOPICS[topic].format(n=rng.randint(2, 90), kind=rng.choice(KINDS)))
+    return " ".join(sentences)
+
+
+def write_documents(directory, documents, pages, words_per_page, seed=5):
+    rng = random.Random(seed)
+    paths = []
+    for document in range(documents):
+        path = os.path.join(directory, f"policy-{document:03d}.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("\f".join(page_text(rng, words_per_page) for _ in range(pages)))
+        paths.append(path)
+    return paths
+
+
+def report(label, stats):
+    print(f"{label:<22} {stats['chunks']:>7,} chunks  {stats['embedded']:>7,} embedded  {stats['cached']:>7,} cached  "
+          f"{stats['seconds']:6.2f}s  {stats['chunks_per_second']:>9,.0f} chunks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure policy ingestion throughput and query latency")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--words-per-page", type=int, default=450)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--budget-ms", type=float, default=50)
+    parser.add_argument("--model", default="hashing-384", help="sentence-transformers model, or hashing-<dim>")
+    args = parser.parse_args()
+
+    embedder = load_embedder(args.model)
+    directory = tempfile.mkdtemp(prefix="policy-bench-")
+    try:
+        paths = write_documents(directory, args.documents, args.pages, args.words_per_page)
+        index_dir = os.path.join(directory, "index")
+        cache = EmbeddingCache(os.path.join(directory, "embeddings.db"))
+
+        report("cold ingest", ingest(paths, embedder, index_dir, cache))
+        report("unchanged re-ingest", ingest(paths, embedder, index_dir, cache))
+        with open(paths[0], encoding="utf-8") as file:
+            pages = file.read().split("\f")
+        pages[3] = page_text(random.Random(99), args.words_per_page)
+        with open(paths[0], "w", encoding="utf-8") as file:
+            file.write("\f".join(pages))
+        stats = ingest(paths, embedder, index_dir, cache)
+        report("one page edited", stats)
+        assert stats["embedded"] <= len(chunk_text(pages[3]))
+
+        index = PolicyIndex(index_dir, embedder, budget_ms=args.budget_ms)
+        rng = random.Random(1)
+        # Mostly repeated questions, as in the chat logs, with some new phrasings
+        questions = [rng.choice(QUESTIONS) if rng.random() < 0.7 else f"{rng.choice(QUESTIONS)} {index}"
+                     for index in range(args.queries)]
+        latencies = []
+        for question in questions:
+            started = time.perf_counter()
+            index.search(question)
+            latencies.append((time.perf_counter() - started) * 1000)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"search over {len(index.chunks):,} chunks: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, "
+              f"{index.timeouts} of {index.searches} over the {args.budget_ms:g} ms budget")
+        hits = index.search(QUESTIONS[0], budget_ms=float("inf"))
+        print(f"top hit for {QUESTIONS[0]!r}: {hits[0]['source']} p.{hits[0]['page']} ({hits[0]['score']:.2f})"
+              if hits else f"no hit for {QUESTIONS[0]!r}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from products import Product, ProductMatcher
+
+# Product matching against a synthetic catalog: one applicant at a time and in batches,
+# through the prefix-bitset indexes and through a linear scan of every product, checking
+# that both return the same ranked products. Timings are reported for several catalog
+# sizes to show how each scales; a full match list is dominated by building the result
+# dicts, so the top-10 column shows the matching itself.
+# Run from the repository root: python -m benchmarks.bench_products
+
+
+def synthetic_catalog(size, seed=3):
+    rng = random.Random(seed)
+    return [
+        Product(
+            id=f"product-{index:05d}",
+            lender=f"Lender {index % 97}",
+            name=f"Product {index}",
+            rate=round(rng.uniform(7.5, 12.5), 2),
+            min_income=rng.choice((0, 15000, 25000, 30000, 50000, round(rng.uniform(10000, 150000), -3))),
+            min_credit_score=rng.choice((600, 650, 700, 750, rng.randint(550, 800))),
+            max_ltv=rng.choice((0.75, 0.8, 0.85, 0.9, round(rng.uniform(0.6, 0.95), 2))),
+            max_loan_amount=rng.choice((np.inf, np.inf, round(rng.uniform(2e6, 5e7), -5))),
+        )
+        for index in range(size)
+    ]
+
+
+def applicants(count, seed=4):
+    rng = np.random.default_rng(seed)
+    property_value = rng.lognormal(15.5, 0.6, count)
+    return {
+        "income": rng.lognormal(11, 0.6, count),
+        "credit_score": rng.integers(450, 850, count).astype(np.float64),
+        "loan_amount": property_value * rng.uniform(0.4, 1.0, count),
+        "property_value": property_value,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare indexed product matching with a linear catalog scan")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--applicants", type=int, default=20_000)
+    parser.add_argument("--singles", type=int, default=500)
+    args = parser.parse_args()
+
+    columns = applicants(args.applicants)
+    singles = [{field: float(column[row]) for field, column in columns.items()} for row in range(args.singles)]
+    print(f"{'products':>8} {'scan/applicant':>15} {'match/applicant':>16} {'top 10':>10} {'batch/applicant':>16} "
+          f"{'avg matches':>12}")
+    for size in args.catalog_sizes:
+        started = time.perf_counter()
+        matcher = ProductMatcher(synthetic_catalog(size))
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scanned = [matcher.scan(details) for details in singles]
+        scan = (time.perf_counter() - started) / len(singles)
+
+        started = time.perf_counter()
+        matched = [[product["id"] for product in matcher.match(details)] for details in singles]
+        single = (time.perf_counter() - started) / len(singles)
+        assert matched == scanned
+
+        started = time.perf_counter()
+        for details in singles:
+            matcher.match(details, limit=10)
+        top = (time.perf_counter() - started) / len(singles)
+
+        started = time.perf_counter()
+        batched = matcher.match_batch(columns)
+        batch = (time.perf_counter() - started) / args.applicants
+        assert batched[:len(singles)] == scanned
+
+        average = sum(map(len, batched)) / len(batched)
+        print(f"{size:>8,} {scan * 1e6:>12,.1f} µs {single * 1e6:>13,.1f} µs {top * 1e6:>7,.1f} µs {batch * 1e6:>13,.2f} µs "
+              f"{average:>12,.1f}   (index built in {build * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from eligibility import check_eligibility_batch, check_mortgage_eligibility
+from rules import get_plan
+
+# Compiled rule plan versus the original branch-heavy check_mortgage_eligibility.
+# Run from the repository root: python -m benchmarks.bench_rules
+
+
+# The function as it was copied into app.py, ap.py and appp.py before the rule engine
+def legacy_check_mortgage_eligibility(details: dict) -> dict:
+    income = details.get("income")
+    credit_score = details.get("credit_score")
+    loan_amount = details.get("loan_amount")
+    property_value = details.get("property_value")
+
+    reasons = []
+    eligible = True
+
+    if income < 30000:
+        reasons.append(f"Your income of {income} is less than the required 30,000 INR per month.")
+        eligible = False
+    if credit_score < 650:
+        reasons.append(f"Your credit score of {credit_score} is below the required 650.")
+        eligible = False
+    if loan_amount > 0.8 * property_value:
+        reasons.append(f"The loan amount of {loan_amount} exceeds 80% of the property value.")
+        eligible = False
+
+    if eligible:
+        return {"eligible": True, "message": "Congratulations! You are eligible for a mortgage loan.",
+                "reasons": [], "suggestions": []}
+
+    suggestions = []
+    if credit_score < 650:
+        suggestions.append("Consider improving your credit score to at least 650.")
+    if loan_amount > 0.8 * property_value:
+        suggestions.append(f"Consider applying for a smaller loan amount (max {0.8 * property_value}).")
+    if income < 30000:
+        suggestions.append("Consider increasing your monthly income to meet the 30,000 INR minimum.")
+    return {"eligible": False,
+            "message": "Sorry, based on the provided details, you are not eligible for a mortgage loan.",
+            "reasons": reasons, "suggestions": suggestions}
+
+
+def applicants(count, seed=7):
+    rng = np.random.default_rng(seed)
+    return {
+        "income": rng.uniform(10000, 90000, count),
+        "credit_score": rng.integers(450, 850, count),
+        "loan_amount": rng.uniform(1e5, 2e6, count),
+        "property_value": rng.uniform(2e5, 2.5e6, count),
+    }
+
+
+def report(name, seconds, rows):
+    print(f"{name:<38} {seconds / rows * 1e9:10.1f} ns/applicant")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled rule plan")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    columns = applicants(args.rows)
+    rows = [dict(zip(columns, values)) for values in zip(*(columns[f].tolist() for f in columns))]
+    plan = get_plan()
+
+    for details in rows[:1000]:
+        assert legacy_check_mortgage_eligibility(details) == check_mortgage_eligibility(details)
+
+    report("legacy check_mortgage_eligibility", timeit.timeit(lambda: [legacy_check_mortgage_eligibility(d) for d in rows], number=1), args.rows)
+    report("compiled check_mortgage_eligibility", timeit.timeit(lambda: [check_mortgage_eligibility(d) for d in rows], number=1), args.rows)
+    report("compiled plan, bitmask only", timeit.timeit(lambda: [plan.evaluate_one(d) for d in rows], number=1), args.rows)
+    report("compiled plan, vectorized batch", timeit.timeit(lambda: check_eligibility_batch(columns), number=10) / 10, args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from chat_messages import AIMessage, HumanMessage
+from conversation_store import ConversationStore
+from sessions import SessionManager
+
+# Memory per session and get() latency for many concurrent chat sessions: the old
+# st.session_state layout (a list of LangChain messages per user) against the
+# SessionManager's slotted records, and the cost of spilling evicted sessions to SQLite.
+# Run from the repository root: python -m benchmarks.bench_sessions
+
+DETAILS = {"income": 45000.0, "credit_score": 700, "loan_amount": 600000.0, "property_value": 900000.0}
+
+
+def conversation(turn_count):
+    for turn in range(turn_count):
+        yield "Human", f"{45000 + turn}"
+        yield "AI", "Great! Now, could you please tell me your credit score?"
+
+
+# What st.session_state held per user before: langchain_core message objects in a list
+def legacy_sessions(count, turns):
+    from langchain_core.messages import AIMessage as LCAIMessage, HumanMessage as LCHumanMessage
+
+    sessions = {}
+    for index in range(count):
+        history = [LCAIMessage(content=content) if role == "AI" else LCHumanMessage(content=content)
+                   for role, content in conversation(turns)]
+        sessions[f"session-{index}"] = {"chat_history": history, "user_details": dict(DETAILS), "next_step": "eligibility_check"}
+    return sessions
+
+
+def managed_sessions(count, turns, manager):
+    for index in range(count):
+        record = manager.get(f"session-{index}")
+        for role, content in conversation(turns):
+            record.chat_history.append(AIMessage(content=content) if role == "AI" else HumanMessage(content=content))
+        record.user_details.update(DETAILS)
+        record.next_step = "eligibility_check"
+    return manager
+
+
+def traced(build):
+    tracemalloc.start()
+    result = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per chat session and eviction cost")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    args = parser.parse_args()
+
+    try:
+        # Import outside the measurement so only the session objects are counted
+        legacy_sessions(1, 1)
+        _, legacy = traced(lambda: legacy_sessions(args.sessions, args.turns))
+        print(f"LangChain messages in session_state  {legacy / args.sessions:8.0f} bytes/session")
+    except ImportError:
+        print("langchain_core not installed; skipping the session_state baseline")
+
+    manager, managed = traced(lambda: managed_sessions(args.sessions, args.turns, SessionManager(max_sessions=args.sessions)))
+    stats = manager.stats()
+    print(f"SessionManager records               {managed / args.sessions:8.0f} bytes/session "
+          f"(stats() estimate {stats['bytes_per_session']:.0f}, {stats['sessions']} sessions)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ConversationStore(os.path.join(directory, "sessions.db"))
+        manager = SessionManager(max_sessions=args.max_sessions, store=store)
+        started = time.perf_counter()
+        managed_sessions(args.sessions, args.turns, manager)
+        for index in range(args.sessions):
+            manager.save(manager.get(f"session-{index}"))
+        elapsed = time.perf_counter() - started
+        stats = manager.stats()
+        print(f"With max_sessions={args.max_sessions} and a store: {stats['sessions']} in memory, "
+              f"{stats['evictions']} evictions, {stats['spills']} spills, {stats['loads']} loads, "
+              f"{elapsed / (2 * args.sessions) * 1e6:.0f} us per get")
+
+        started = time.perf_counter()
+        for index in range(0, args.sessions, 10):
+            record = manager.get(f"session-{index}")
+            assert len(record.chat_history) == 2 * args.turns and record.user_details == DETAILS
+        print(f"Reloading spilled sessions: {(time.perf_counter() - started) / (args.sessions // 10) * 1e6:.0f} us per get")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import time
+
+import numpy as np
+
+import solver
+
+# Time a what-if sensitivity surface over a loan amount x property value grid.
+# Run from the repository root: python -m benchmarks.bench_solver
+
+BASE = {"income": 45000.0, "credit_score": 700, "loan_amount": 600000.0, "property_value": 900000.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the what-if solver")
+    parser.add_argument("--size", type=int, default=1000, help="grid points per axis")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    loan_amounts = np.linspace(1e5, 3e6, args.size)
+    property_values = np.linspace(1e5, 4e6, args.size)
+    incomes = np.linspace(1e4, 1e5, args.size)
+    credit_scores = np.linspace(300, 900, args.size)
+
+    cases = {
+        "eligibility surface (loan x property)":
+            lambda: solver.sensitivity_surface(BASE, "loan_amount", loan_amounts, "property_value", property_values),
+        "eligibility surface (income x credit)":
+            lambda: solver.sensitivity_surface(BASE, "income", incomes, "credit_score", credit_scores),
+        "boundaries + gaps (loan x property)":
+            lambda: solver.gaps({**BASE, "loan_amount": loan_amounts[np.newaxis, :],
+                                 "property_value": property_values[:, np.newaxis]}),
+    }
+    for name, case in cases.items():
+        case()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            case()
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{name:<40} {args.size}x{args.size}: {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
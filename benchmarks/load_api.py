@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import orjson
+
+# Load test for the rule-only /eligibility route. Starts one single-worker
+# uvicorn process (one core) and drives it with keep-alive connections from
+# separate client processes, then fails if throughput is below --target.
+# Run from the repository root: python -m benchmarks.load_api
+
+APPLICANT = orjson.dumps({"income": 45000, "credit_score": 700, "loan_amount": 600000, "property_value": 900000})
+
+
+def build_request(port):
+    return (
+        b"POST /eligibility HTTP/1.1\r\n"
+        b"Host: 127.0.0.1:%d\r\n"
+        b"Content-Type: application/json\r\n"
+        b"Content-Length: %d\r\n\r\n" % (port, len(APPLICANT))
+    ) + APPLICANT
+
+
+async def connection(port, deadline, counts):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = build_request(port)
+    while time.perf_counter() < deadline:
+        writer.write(request)
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = int(headers.split(b"content-length: ")[1].split(b"\r\n")[0])
+        await reader.readexactly(length)
+        if headers.startswith(b"HTTP/1.1 200"):
+            counts[0] += 1
+        else:
+            counts[1] += 1
+    writer.close()
+
+
+async def drive(port, connections, duration):
+    counts = [0, 0]
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(connection(port, deadline, counts) for _ in range(connections)))
+    return counts
+
+
+def client_process(port, connections, duration, results):
+    results.put(asyncio.run(drive(port, connections, duration)))
+
+
+def wait_for_server(port, timeout=15):
+    import socket
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("API server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the rule-only eligibility endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=2, help="client processes")
+    parser.add_argument("--connections", type=int, default=32, help="connections per client process")
+    parser.add_argument("--target", type=float, default=5000.0, help="minimum requests per second")
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(args.port), "--workers", "1",
+         "--http", "httptools", "--log-level", "warning", "--no-access-log"],
+        env={**os.environ, "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "unused")},
+    )
+    try:
+        wait_for_server(args.port)
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=client_process, args=(args.port, args.connections, args.duration, results))
+            for _ in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        ok = errors = 0
+        for _ in clients:
+            done, failed = results.get()
+            ok += done
+            errors += failed
+        for client in clients:
+            client.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    rps = ok / args.duration
+    print(f"{ok} ok, {errors} errors in {args.duration:.0f}s: {rps:.0f} requests/sec on one worker")
+    if errors or rps < args.target:
+        print(f"FAIL: below the {args.target:.0f} requests/sec target" if rps < args.target else "FAIL: errors")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Groq chat completions API so benchmarks run offline
+
+STUB_REPLY = "Thanks! Could you share the next detail so I can check your eligibility?"
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.throttle():
+            return
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if request.get("stream"):
+            self.stream_reply(request)
+            return
+
+        body = json.dumps({
+            "id": "stub-%d" % self.server.requests,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.server.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 60, "completion_tokens": 16, "total_tokens": 76},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Reject the request with a Groq-style 429 when more than rate_limit requests
+    # arrived in the last second
+    def throttle(self) -> bool:
+        if not self.server.rate_limit:
+            return False
+        now = time.monotonic()
+        with self.server.lock:
+            window = self.server.window
+            while window and window[0] <= now - 1.0:
+                window.popleft()
+            if len(window) < self.server.rate_limit:
+                window.append(now)
+                return False
+            self.server.throttled += 1
+            retry_after = window[0] + 1.0 - now
+
+        body = json.dumps({"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                     "code": "rate_limit_exceeded"}}).encode()
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("retry-after", "%.3f" % retry_after)
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    # OpenAI-style SSE chunks, one word per chunk, spaced by token_delay
+    def stream_reply(self, request):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        words = self.server.reply.split(" ")
+        for i, word in enumerate(words):
+            if i and self.server.token_delay:
+                time.sleep(self.server.token_delay)
+            chunk = {
+                "id": "stub-%d" % self.server.requests,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": "stop" if i == len(words) - 1 else None,
+                }],
+            }
+            self.write_chunk(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+# Start the stub in a background thread; returns the server and its base URL.
+# rate_limit > 0 makes it answer 429 above that many requests per second.
+def start_stub_server(latency: float = 0.0, reply: str = STUB_REPLY, token_delay: float = 0.0, rate_limit: int = 0):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.reply = reply
+    server.token_delay = token_delay
+    server.requests = 0
+    server.rate_limit = rate_limit
+    server.throttled = 0
+    server.window = deque()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d" % server.server_port
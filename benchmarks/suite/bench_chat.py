@@ -0,0 +1,61 @@
+import pytest
+
+import chat
+import intents
+from benchmarks.stub_llm import STUB_REPLY
+from benchmarks.suite.data import ELIGIBLE, INELIGIBLE
+from chat_messages import AIMessage, HumanMessage
+from conversation import Conversation
+from llm import response_cache
+
+# The full get_response path the Streamlit apps run, against the stub LLM
+
+OPEN_QUESTION = "what's the difference between fixed and floating rates"
+
+
+def history():
+    conversation = Conversation()
+    for turn in range(30):
+        conversation.append(HumanMessage(content=f"question {turn}"))
+        conversation.append(AIMessage(content=f"answer {turn}"))
+    return conversation
+
+
+@pytest.mark.benchmark(group="chat-local")
+@pytest.mark.parametrize("message", ["1000000", "why am I not eligible?", "how do I improve", "what's my max loan"])
+def bench_local_turn(benchmark, load_chain, message):
+    reply = benchmark(chat.get_response, message, INELIGIBLE, "eligibility_check", load_chain)
+    assert reply != STUB_REPLY
+
+
+@pytest.mark.benchmark(group="chat-local")
+def bench_classify(benchmark):
+    assert benchmark(intents.classify, OPEN_QUESTION) is None
+
+
+@pytest.mark.benchmark(group="chat-llm")
+def bench_llm_turn(benchmark, load_chain):
+    conversation = history()
+    reply = benchmark.pedantic(
+        chat.get_response, args=(OPEN_QUESTION, ELIGIBLE, "eligibility_check", load_chain, False, conversation),
+        setup=response_cache.clear, rounds=20, warmup_rounds=1,
+    )
+    assert reply == STUB_REPLY
+
+
+@pytest.mark.benchmark(group="chat-llm")
+def bench_llm_turn_streamed(benchmark, load_chain):
+    conversation = history()
+
+    def turn():
+        return "".join(chat.get_response(OPEN_QUESTION, ELIGIBLE, "eligibility_check", load_chain, True, conversation))
+
+    assert benchmark.pedantic(turn, setup=response_cache.clear, rounds=20, warmup_rounds=1) == STUB_REPLY
+
+
+@pytest.mark.benchmark(group="chat-llm")
+def bench_llm_turn_cached(benchmark, load_chain):
+    conversation = history()
+    chat.get_response(OPEN_QUESTION, ELIGIBLE, "eligibility_check", load_chain, False, conversation)
+    reply = benchmark(chat.get_response, OPEN_QUESTION, ELIGIBLE, "eligibility_check", load_chain, False, conversation)
+    assert reply == STUB_REPLY
@@ -0,0 +1,69 @@
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import chat
+from chat_messages import AIMessage, HumanMessage
+from conversation_store import ConversationStore
+from llm import response_cache
+from sessions import SessionManager
+
+# Many users chatting at once, the way Streamlit serves them: one thread per session
+# script run, shared SessionManager and store, one get_response per assistant turn.
+
+STEPS = ("income", "credit_score", "loan_amount", "property_value")
+QUESTIONS = ("1000000", "why", "what is a balance transfer and should I consider one?", "how do I improve", "thanks")
+
+_user_ids = itertools.count()
+
+
+def conversation(manager, load_chain, user):
+    session_id = f"user-{next(_user_ids)}"
+    details = {"income": 20000.0 + 1000 * user, "credit_score": 600 + user, "loan_amount": 800000.0, "property_value": 1e6}
+    turns = 0
+    for field in STEPS:
+        record = manager.get(session_id)
+        record.chat_history.append(HumanMessage(content=str(details[field])))
+        record.user_details[field] = details[field]
+        record.chat_history.append(AIMessage(content="Thanks! Next detail please."))
+        manager.save(record)
+        turns += 1
+    for question in QUESTIONS:
+        record = manager.get(session_id)
+        record.chat_history.append(HumanMessage(content=question))
+        reply = chat.get_response(question, record.user_details, "eligibility_check", load_chain, False, record.chat_history)
+        record.chat_history.append(AIMessage(content=reply))
+        manager.save(record)
+        turns += 1
+    return turns
+
+
+@pytest.mark.benchmark(group="chat-load")
+def bench_concurrent_users(benchmark, request, stub_llm, load_chain, tmp_path):
+    users = request.config.getoption("--chat-users")
+    manager = SessionManager(max_sessions=users // 2 or 1, store=ConversationStore(str(tmp_path / "chat_data.db")))
+    server = stub_llm[0]
+    llm_calls = server.requests
+    # Timed here too, since benchmark.stats is unset under --benchmark-disable
+    seconds = []
+
+    def run():
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            turns = sum(pool.map(lambda user: conversation(manager, load_chain, user), range(users)))
+        seconds.append(time.perf_counter() - started)
+        return turns
+
+    # Every round starts with a cold response cache, so each user's open question reaches the LLM
+    turns = benchmark.pedantic(run, setup=response_cache.clear, rounds=3)
+    rounds = len(seconds)
+    benchmark.extra_info.update({
+        "users": users,
+        "turns_per_round": turns,
+        "turns_per_second": turns * rounds / sum(seconds),
+        "llm_calls_per_round": (server.requests - llm_calls) / rounds,
+        "sessions": manager.stats(),
+    })
+    assert server.requests - llm_calls == users * rounds
@@ -0,0 +1,64 @@
+import pytest
+
+from benchmarks.suite.data import ELIGIBLE, INELIGIBLE
+from eligibility import Evaluation, check_eligibility_batch, check_mortgage_eligibility, explain_batch
+from rules import get_plan
+from solver import improvement_suggestions
+
+
+@pytest.mark.benchmark(group="eligibility-scalar")
+@pytest.mark.parametrize("details", [ELIGIBLE, INELIGIBLE], ids=["eligible", "ineligible"])
+def bench_check_mortgage_eligibility(benchmark, details):
+    result = benchmark(check_mortgage_eligibility, details)
+    assert result["eligible"] is (details is ELIGIBLE)
+
+
+@pytest.mark.benchmark(group="eligibility-scalar")
+def bench_plan_bitmask(benchmark):
+    plan = get_plan()
+    assert benchmark(plan.evaluate_one, INELIGIBLE) == 7
+
+
+@pytest.mark.benchmark(group="eligibility-scalar")
+def bench_improvement_suggestions(benchmark):
+    assert len(benchmark(improvement_suggestions, INELIGIBLE)) == 3
+
+
+@pytest.mark.benchmark(group="eligibility-batch")
+def bench_batch_100k(benchmark, applicants):
+    result = benchmark(check_eligibility_batch, applicants)
+    assert len(result.failures) == len(applicants["income"])
+
+
+@pytest.mark.benchmark(group="eligibility-batch")
+def bench_batch_explain_1k(benchmark, applicants):
+    columns = {field: values[:1000] for field, values in applicants.items()}
+    result = check_eligibility_batch(columns)
+    explanations = benchmark(explain_batch, columns, result)
+    assert len(explanations) == int((~result.eligible).sum())
+
+
+# A session's memoized result: unchanged details are a cache hit; one edited field re-checks its rules only
+@pytest.mark.benchmark(group="eligibility-scalar")
+def bench_evaluation_unchanged(benchmark):
+    evaluation = Evaluation()
+    evaluation.result(INELIGIBLE)
+    assert benchmark(evaluation.result, INELIGIBLE)["eligible"] is False
+
+
+@pytest.mark.benchmark(group="eligibility-scalar")
+def bench_evaluation_one_field_changed(benchmark):
+    evaluation = Evaluation()
+    details = dict(INELIGIBLE)
+    incomes = iter(range(10 ** 9))
+
+    def edit():
+        details["income"] = float(next(incomes))
+        return evaluation.result(details)
+
+    edit()
+    checks = evaluation.checks
+    edit()
+    # Only the rules reading income: the income minimum and the EMI-to-income cap
+    assert evaluation.checks - checks == 2
+    assert benchmark(edit)["eligible"] is False
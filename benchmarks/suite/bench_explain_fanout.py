@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.stub_llm import STUB_REPLY, start_stub_server
+from conversation import summarize
+from explanations import ExplanationPipeline
+from llm import DEFAULT_MODEL, cached_invoke, get_chain, prompt_inputs, response_cache
+
+# Explanations for a batch of ineligible applicants against a stub that enforces a
+# request-per-second quota, like Groq. The serial loop is the baseline; the pipeline
+# fans out, collapses duplicate prompts and retries the 429s it provokes.
+
+RATE_LIMIT = 50
+# 200 applicants, 50 distinct profiles
+APPLICANTS = [
+    {"income": 20000.0 + 500 * (row % 50), "credit_score": 600.0, "loan_amount": 900000.0, "property_value": 1e6}
+    for row in range(200)
+]
+
+
+@pytest.fixture(scope="module")
+def throttled_llm(request):
+    os.environ.setdefault("GROQ_API_KEY", "stub-key")
+    server, base_url = start_stub_server(latency=request.config.getoption("--llm-latency"), rate_limit=RATE_LIMIT)
+    yield server, get_chain(DEFAULT_MODEL, 0, base_url, max_retries=0)
+    server.shutdown()
+
+
+@pytest.mark.benchmark(group="explain-fanout")
+def bench_serial_unique_prompts(benchmark, throttled_llm):
+    server, chain = throttled_llm
+    unique = list({tuple(details.values()): details for details in APPLICANTS}.values())
+
+    def run():
+        return [
+            cached_invoke(chain, prompt_inputs(details, "eligibility_check", {"summary": summarize(details)}))
+            for details in unique
+        ]
+
+    assert benchmark.pedantic(run, setup=response_cache.clear, rounds=1) == [STUB_REPLY] * len(unique)
+
+
+@pytest.mark.benchmark(group="explain-fanout")
+@pytest.mark.parametrize("concurrency", [4, 16])
+def bench_pipeline(benchmark, throttled_llm, concurrency):
+    server, chain = throttled_llm
+    throttled = server.throttled
+    pipelines = []
+
+    # The client's request quota is set above the server's so the stub answers some requests with 429
+    def run():
+        pipeline = ExplanationPipeline(chain, concurrency=concurrency, rpm=RATE_LIMIT * 60 * 2, tpm=1e7,
+                                       base_delay=0.05)
+        pipelines.append(pipeline)
+        return asyncio.run(pipeline.explain(APPLICANTS))
+
+    explanations = benchmark.pedantic(run, setup=response_cache.clear, rounds=3)
+    stats = pipelines[-1].stats
+    benchmark.extra_info.update(stats)
+    benchmark.extra_info["server_throttled"] = server.throttled - throttled
+    assert explanations == [STUB_REPLY] * len(APPLICANTS)
+    assert stats["unique"] == 50 and stats["failed"] == 0
+    assert stats["calls"] == stats["unique"] + stats["retries"]
@@ -0,0 +1,98 @@
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+import audit
+
+from benchmarks.suite.data import ELIGIBLE
+from chat_messages import AIMessage, HumanMessage
+from eligibility import check_eligibility_batch
+from conversation_store import ConversationStore
+from sessions import SessionManager
+
+TURN = [("Human", "900000"), ("AI", "Thank you for providing all the details. Let me check your eligibility...")]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(str(tmp_path / "chat_data.db"))
+
+
+@pytest.mark.benchmark(group="persistence-store")
+def bench_store_append_turn(benchmark, store):
+    benchmark(store.append, "session", TURN, ELIGIBLE, "eligibility_check")
+
+
+@pytest.mark.benchmark(group="persistence-store")
+def bench_store_load_tail(benchmark, store):
+    for _ in range(500):
+        store.append("session", TURN, ELIGIBLE, "eligibility_check")
+    messages, details, _ = benchmark(store.load, "session", 20)
+    assert len(messages) == 20 and details == ELIGIBLE
+
+
+@pytest.mark.benchmark(group="persistence-sessions")
+def bench_session_get_in_memory(benchmark):
+    manager = SessionManager(greeting="Hello!")
+    manager.get("session")
+    assert benchmark(manager.get, "session").session_id == "session"
+
+
+# Every get misses memory: with room for one session, alternating ids spill and reload each time
+@pytest.mark.benchmark(group="persistence-sessions")
+def bench_session_get_spilled(benchmark, store):
+    manager = SessionManager(max_sessions=1, store=store)
+    for session_id in ("a", "b"):
+        record = manager.get(session_id)
+        record.chat_history.append(HumanMessage(content="45000"))
+        record.chat_history.append(AIMessage(content="Great! Now, could you please tell me your credit score?"))
+        manager.save(record)
+    ids = itertools.cycle("ab")
+    benchmark(lambda: manager.get(next(ids)))
+    assert manager.loads > 0
+
+
+@pytest.mark.benchmark(group="persistence-sessions")
+def bench_session_save_turn(benchmark, store):
+    manager = SessionManager(store=store)
+    record = manager.get("session")
+
+    def turn():
+        record.chat_history.append(HumanMessage(content="why"))
+        record.chat_history.append(AIMessage(content="You're already eligible for a mortgage loan."))
+        manager.save(record)
+
+    benchmark(turn)
+
+
+# Recording a decision on the request path: put on the write-behind queue
+@pytest.mark.benchmark(group="persistence-audit")
+def bench_audit_record_decision(benchmark, tmp_path):
+    log = audit.AuditLog(str(tmp_path), fsync="always")
+    benchmark(log.record_decision, ELIGIBLE, 0, session="session")
+    log.close()
+    assert log.stats()["written"] == log.stats()["queued"]
+
+
+# The same record written and synced before the request returns
+@pytest.mark.benchmark(group="persistence-audit")
+def bench_audit_write_through(benchmark, tmp_path):
+    records = np.zeros(1, audit.RECORD)
+    with open(tmp_path / "write-through.audit", "ab", buffering=0) as file:
+        def record():
+            file.write(audit.encode_block(records, ["default", "session"]))
+            os.fsync(file.fileno())
+
+        benchmark(record)
+
+
+# Re-checking 100k historical decisions against the current rules
+@pytest.mark.benchmark(group="persistence-audit")
+def bench_audit_replay(benchmark, tmp_path, applicants):
+    log = audit.AuditLog(str(tmp_path), fsync="never")
+    log.record_batch(applicants, check_eligibility_batch(applicants).failures)
+    log.close()
+    drift = benchmark(audit.replay, str(tmp_path))
+    assert drift.decisions == len(applicants["income"]) and drift.drifted == 0
@@ -0,0 +1,20 @@
+import pytest
+
+from stress import stress_test, summarize
+
+
+@pytest.mark.benchmark(group="stress")
+@pytest.mark.parametrize("scenarios", [100, 1000])
+def bench_stress_100k(benchmark, applicants, scenarios):
+    result = benchmark.pedantic(stress_test, args=(applicants, scenarios), rounds=3)
+    summary = summarize(result)
+    benchmark.extra_info.update({"eligible": summary["eligible"], "mean_pass_rate": summary["pass_rate"]["mean"],
+                                 "top_rule": summary["top_rule"]})
+    assert summary["applicants"] == len(applicants["income"]) and 0 < summary["pass_rate"]["mean"] < 1
+
+
+# Smaller scenario blocks bound memory tighter at about the same speed; results stay statistically the same
+@pytest.mark.benchmark(group="stress")
+def bench_stress_small_blocks(benchmark, applicants):
+    result = benchmark.pedantic(stress_test, args=(applicants, 100), kwargs={"max_cells": 1 << 16}, rounds=3)
+    assert abs(result.pass_rate.mean() - stress_test(applicants, 100).pass_rate.mean()) < 0.01
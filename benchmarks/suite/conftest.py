@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.stub_llm import start_stub_server
+
+# Shared fixtures for the benchmark suite. The LLM is always the local stub server from
+# benchmarks/stub_llm.py, so the suite runs offline; --llm-latency sets its round-trip.
+
+
+def pytest_addoption(parser):
+    parser.addoption("--llm-latency", type=float, default=0.05, help="stub Groq round-trip in seconds")
+    parser.addoption("--chat-users", type=int, default=20, help="concurrent users in the chat load benchmark")
+
+
+@pytest.fixture(scope="session")
+def stub_llm(request):
+    os.environ.setdefault("GROQ_API_KEY", "stub-key")
+    server, base_url = start_stub_server(latency=request.config.getoption("--llm-latency"))
+    yield server, base_url
+    server.shutdown()
+
+
+# What the apps pass to chat.get_response: a callable returning the chain, here pointed at the stub
+@pytest.fixture(scope="session")
+def load_chain(stub_llm):
+    from llm import DEFAULT_MODEL, get_chain
+
+    chain = get_chain(DEFAULT_MODEL, 0, stub_llm[1])
+    return lambda: chain
+
+
+# Decisions recorded by the benchmarks go to a temporary audit log, not ./audit
+@pytest.fixture(scope="session", autouse=True)
+def audit_log(tmp_path_factory):
+    import audit
+
+    log = audit.AuditLog(str(tmp_path_factory.mktemp("audit")))
+    previous = audit.set_audit_log(log)
+    yield log
+    audit.set_audit_log(previous)
+    log.close()
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    from llm import response_cache
+
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
+@pytest.fixture(scope="session")
+def applicants():
+    rng = np.random.default_rng(7)
+    count = 100000
+    return {
+        "income": rng.uniform(10000, 90000, count),
+        "credit_score": rng.integers(450, 850, count).astype(np.float64),
+        "loan_amount": rng.uniform(1e5, 2e6, count),
+        "property_value": rng.uniform(2e5, 2.5e6, count),
+    }
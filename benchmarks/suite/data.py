@@ -0,0 +1,4 @@
+# Applicants shared by the benchmark modules
+
+ELIGIBLE = {"income": 45000.0, "credit_score": 700, "loan_amount": 600000.0, "property_value": 900000.0}
+INELIGIBLE = {"income": 25000.0, "credit_score": 600, "loan_amount": 900000.0, "property_value": 1000000.0}
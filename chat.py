@@ -0,0 +1,67 @@
+import time
+
+import audit
+from conversation import Conversation, prompt_context
+from eligibility import evaluate_applicant
+from instrumentation import span
+from intents import respond
+from llm import DEFAULT_MODEL, cached_invoke, cached_stream, prompt_inputs
+from policy_docs import load_index, policy_context
+
+# One chat turn, shared by app.py, ap.py and appp.py so the three apps cannot drift
+# apart again. load_chain is called only when a turn actually needs the LLM.
+
+# The policy index loads in the background; turns before it is ready get no excerpts
+load_index()
+
+
+# evaluation is the session's memoized eligibility.Evaluation, when it has one. Every
+# decision, and every LLM reply, is recorded in the audit log under session_id.
+def get_response(user_query: str, user_details: dict, next_step: str, load_chain,
+                 stream: bool = False, chat_history=None, evaluation=None, session_id: str = None):
+    started = time.perf_counter()
+    with span("eligibility.check"):
+        if evaluation is not None:
+            eligibility_info = evaluation.result(user_details)
+            failures = evaluation.bitmask
+        else:
+            failures, eligibility_info = evaluate_applicant(user_details)
+    audit.record_decision(user_details, failures, latency=time.perf_counter() - started, session=session_id)
+    # The LLM sees a summary of the details plus the last few messages, not the whole history
+    context = prompt_context(chat_history or Conversation(), user_details)
+
+    # Open questions are grounded in the policy documents, when an index has been built
+    def inputs():
+        return prompt_inputs(user_details, next_step, dict(context, policy=policy_context(user_query)))
+
+    def record(reply: str, llm_started: float):
+        audit.record_explanation(user_details, failures, reply, DEFAULT_MODEL, time.perf_counter() - llm_started,
+                                 session=session_id)
+
+    def llm_reply():
+        llm_started = time.perf_counter()
+        reply = cached_invoke(load_chain(), inputs())
+        record(reply, llm_started)
+        return reply
+
+    # A streamed reply is recorded once the stream completes
+    def llm_stream():
+        llm_started = time.perf_counter()
+        tokens = cached_stream(load_chain(), inputs())
+        if isinstance(tokens, str):
+            record(tokens, llm_started)
+            return tokens
+        return _recorded_stream(tokens, lambda reply: record(reply, llm_started))
+
+    # Known intents (the verdict, why, suggestions, max loan, ...) are answered locally from the
+    # eligibility result; only open-ended messages reach the LLM. When streaming, the LLM reply is
+    # a token generator (or the cached reply)
+    return respond(user_query, user_details, eligibility_info, llm_stream if stream else llm_reply)
+
+
+def _recorded_stream(tokens, record):
+    parts = []
+    for token in tokens:
+        parts.append(token)
+        yield token
+    record("".join(parts))
@@ -0,0 +1,27 @@
+# Lightweight stand-ins for LangChain's AIMessage and HumanMessage. The Streamlit
+# apps only need a role and the text, and importing langchain_core.messages on
+# every cold start costs far more than the apps' own code.
+
+
+class ChatMessage:
+    __slots__ = ("content",)
+    type = "generic"
+
+    def __init__(self, content: str):
+        self.content = content
+
+    def __repr__(self):
+        return f"{type(self).__name__}(content={self.content!r})"
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.content == self.content
+
+
+class AIMessage(ChatMessage):
+    __slots__ = ()
+    type = "ai"
+
+
+class HumanMessage(ChatMessage):
+    __slots__ = ()
+    type = "human"
@@ -0,0 +1,107 @@
+import logging
+import time
+from collections import deque
+from itertools import islice
+
+from eligibility import FIELDS
+from instrumentation import record
+from rules import get_plan
+
+logger = logging.getLogger(__name__)
+
+# Bounded conversation context. A session holds at most MAX_MESSAGES in memory; the
+# LLM sees a compact summary of the collected details and the eligibility outcome plus
+# a sliding window of the most recent messages; the UI renders one page of messages at
+# a time. None of these grow with the length of the conversation.
+
+MAX_MESSAGES = 200
+WINDOW_MESSAGES = 8
+WINDOW_TOKENS = 400
+PAGE_SIZE = 20
+
+
+# Rough token count (about four characters per token for English text); good enough
+# to budget prompts without loading a tokenizer
+def approx_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+# Chat history with a fixed memory cap; the oldest messages fall off once it is full.
+# Supports the list operations the apps use: append, iteration, len and indexing.
+class Conversation:
+    __slots__ = ("messages", "total")
+
+    def __init__(self, messages=(), max_messages: int = MAX_MESSAGES):
+        self.messages = deque(messages, maxlen=max_messages)
+        # Messages ever added, including any that have since fallen off
+        self.total = len(self.messages)
+
+    def append(self, message):
+        self.messages.append(message)
+        self.total += 1
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    # The last `count` messages, oldest first
+    def tail(self, count: int) -> list:
+        return list(islice(reversed(self.messages), count))[::-1]
+
+    # Messages added after the conversation had `total` messages, e.g. the ones still to be saved
+    def new_since(self, total: int) -> list:
+        return self.tail(self.total - total)
+
+    # Most recent messages that fit both the message and the token budget, oldest first
+    def window(self, max_messages: int = WINDOW_MESSAGES, max_tokens: int = WINDOW_TOKENS) -> list:
+        lines = []
+        used = 0
+        for message in reversed(self.tail(max_messages)):
+            line = f"{'Assistant' if message.type == 'ai' else 'User'}: {message.content}"
+            used += approx_tokens(line)
+            if used > max_tokens and lines:
+                break
+            lines.append(line)
+        return lines[::-1]
+
+
+# Structured summary of everything that matters from earlier turns: the details
+# collected so far and, once they are complete, which rules pass or fail
+def summarize(user_details: dict, product: str = "default") -> str:
+    collected = [f"{field}={user_details[field]:,.0f}" for field in FIELDS if user_details.get(field) is not None]
+    if not collected:
+        return "No details collected yet."
+    summary = "Collected " + ", ".join(collected) + "."
+    if len(collected) < len(FIELDS):
+        return summary
+
+    plan = get_plan(product)
+    failures = plan.evaluate_one(user_details)
+    if not failures:
+        return summary + " Outcome: eligible."
+    failed = [rule.id for rule in plan.rules if failures & rule.bit]
+    return summary + " Outcome: not eligible (failed: " + ", ".join(failed) + ")."
+
+
+# Prompt variables for the conversation so far
+def prompt_context(conversation, user_details: dict) -> dict:
+    return {
+        "summary": summarize(user_details),
+        "history": "\n    ".join(conversation.window()) or "(none)",
+    }
+
+
+# Render one page of messages with render(message) and log how long it took
+def render_page(conversation, visible: int, render) -> float:
+    started = time.perf_counter()
+    for message in conversation.tail(visible):
+        render(message)
+    render_ms = (time.perf_counter() - started) * 1000
+    record("ui.render", render_ms / 1000)
+    logger.debug("rendered %d of %d messages in %.1f ms", min(visible, len(conversation)), len(conversation), render_ms)
+    return render_ms
@@ -0,0 +1,134 @@
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_DB_PATH = "chat_data.db"
+LEGACY_PICKLE_PATH = "chat_data.pkl"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_details TEXT NOT NULL,
+    next_step TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+# Session-keyed, append-only conversation store on SQLite in WAL mode.
+# Messages are (role, content) pairs; only new messages are written and only a
+# session's tail is read back, so the cost of a turn does not grow with history.
+class ConversationStore:
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    # One connection per thread; WAL lets readers proceed while a writer commits
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Append new messages and update the session's details in one transaction
+    def append(self, session_id: str, messages, user_details: dict, next_step: str):
+        conn = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent writers
+        # to the same session cannot allocate the same sequence numbers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (last_seq,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, last_seq + 1 + i, role, content, now) for i, (role, content) in enumerate(messages)],
+            )
+            conn.execute(
+                "INSERT INTO sessions (session_id, user_details, next_step, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET user_details = excluded.user_details, "
+                "next_step = excluded.next_step, updated = excluded.updated",
+                (session_id, json.dumps(user_details), next_step, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Load the last `limit` messages plus the session's details and next step
+    def load(self, session_id: str, limit: int = 100):
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+        session = conn.execute(
+            "SELECT user_details, next_step FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if session is None:
+            return rows[::-1], {}, "get_income"
+        return rows[::-1], json.loads(session[0]), session[1]
+
+    def delete(self, session_id: str):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Import the old single-file pickle into a session, once. The pickle is
+    # renamed first so that only one session can claim it.
+    def migrate_pickle(self, session_id: str, path: str = LEGACY_PICKLE_PATH) -> bool:
+        claimed = path + ".migrating"
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return False
+
+        try:
+            with open(claimed, "rb") as file:
+                data = pickle.load(file)
+        except EOFError:
+            data = {}
+
+        messages = [(_legacy_role(message), message.content) for message in data.get("chat_history", [])]
+        self.append(session_id, messages, data.get("user_details", {}), data.get("next_step", "get_income"))
+        os.replace(claimed, path + ".migrated")
+        return True
+
+
+# LangChain messages carry their role as .type ("ai" or "human")
+def _legacy_role(message) -> str:
+    return "AI" if message.type == "ai" else "Human"
+
+
+if __name__ == "__main__":
+    # python conversation_store.py <session_id> [chat_data.pkl] [chat_data.db]
+    session_id = sys.argv[1]
+    pickle_path = sys.argv[2] if len(sys.argv) > 2 else LEGACY_PICKLE_PATH
+    db_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB_PATH
+    if ConversationStore(db_path).migrate_pickle(session_id, pickle_path):
+        print(f"Migrated {pickle_path} into session {session_id} in {db_path}")
+    else:
+        print(f"Nothing to migrate: {pickle_path} not found")
@@ -0,0 +1,164 @@
+from typing import NamedTuple
+import numpy as np
+
+from rules import get_plan
+
+# Failure bits used by the default rule set (rulesets/default.json)
+FAIL_INCOME = 1
+FAIL_CREDIT_SCORE = 2
+FAIL_LTV = 4
+FAIL_EMI_TO_INCOME = 8
+
+FIELDS = ("income", "credit_score", "loan_amount", "property_value")
+# Only needed for the EMI-to-income rule, which is skipped when they are absent
+OPTIONAL_FIELDS = ("interest_rate", "tenure_months")
+
+ELIGIBLE_MESSAGE = "Congratulations! You are eligible for a mortgage loan."
+INELIGIBLE_MESSAGE = "Sorry, based on the provided details, you are not eligible for a mortgage loan."
+
+
+class BatchResult(NamedTuple):
+    eligible: np.ndarray
+    failures: np.ndarray
+    max_loan: np.ndarray
+
+
+# Pull the plan's input columns, plus any optional ones present, out of a dict of arrays or a DataFrame
+def _columns(data, plan, dtype=np.float64) -> dict:
+    fields = dict.fromkeys(plan.fields + ("loan_amount",))
+    fields.update((field, None) for field in plan.optional_fields if field in data)
+    return {field: np.asarray(data[field], dtype=dtype) for field in fields}
+
+
+# Rows that cannot be scored: a required input is missing, non-finite or out of range,
+# or an optional one is given but out of range
+def invalid_rows(data) -> np.ndarray:
+    columns = {field: np.asarray(data[field], dtype=np.float64) for field in FIELDS}
+    invalid = ~np.isfinite(np.column_stack([columns[field] for field in FIELDS])).all(axis=1)
+    with np.errstate(invalid="ignore"):
+        invalid |= (columns["income"] < 0) | (columns["credit_score"] < 0) | (columns["loan_amount"] < 0)
+        invalid |= columns["property_value"] <= 0
+        # Optional loan terms are NaN where absent, which passes these checks
+        if "interest_rate" in data:
+            rate = np.asarray(data["interest_rate"], dtype=np.float64)
+            invalid |= (rate < 0) | (rate > 100)
+        if "tenure_months" in data:
+            tenure = np.asarray(data["tenure_months"], dtype=np.float64)
+            invalid |= (tenure <= 0) | (tenure > 600)
+    return invalid
+
+
+# Score every applicant in one vectorized pass of the product's compiled rule plan
+def check_eligibility_batch(data, product: str = "default") -> BatchResult:
+    plan = get_plan(product)
+    columns = _columns(data, plan)
+    failures = plan.evaluate(columns)
+    return BatchResult(failures == 0, failures, plan.max_loan(columns))
+
+
+# Reasons and suggestions for the failing rows only; rows defaults to every failing row
+def explain_batch(data, result: BatchResult, rows=None, product: str = "default") -> dict:
+    plan = get_plan(product)
+    # Keep the caller's dtypes so an integer credit score is reported as one
+    columns = _columns(data, plan, dtype=None)
+    if rows is None:
+        rows = np.flatnonzero(result.failures)
+
+    explanations = {}
+    for row in rows:
+        row = int(row)
+        failures = int(result.failures[row])
+        if not failures:
+            continue
+        reasons, suggestions = plan.explain(failures, {field: column[row].item() for field, column in columns.items()})
+        explanations[row] = {"reasons": reasons, "suggestions": suggestions}
+    return explanations
+
+
+# The result dict for a failure bitmask; details must already carry the plan's derived fields
+def _result(plan, failures: int, details: dict) -> dict:
+    if not failures:
+        return {
+            "eligible": True,
+            "message": ELIGIBLE_MESSAGE,
+            "reasons": [],
+            "suggestions": []
+        }
+
+    reasons, suggestions = plan.explain(failures, details)
+    return {
+        "eligible": False,
+        "message": INELIGIBLE_MESSAGE,
+        "reasons": reasons,
+        "suggestions": suggestions
+    }
+
+
+# (failure bitmask, result dict) for one applicant
+def evaluate_applicant(details: dict, product: str = "default") -> tuple:
+    plan = get_plan(product)
+    details = plan.prepare(details)
+    failures = plan.evaluate_one(details)
+    return failures, _result(plan, failures, details)
+
+
+# Check mortgage eligibility and provide reasons if ineligible
+def check_mortgage_eligibility(details: dict, product: str = "default") -> dict:
+    return evaluate_applicant(details, product)[1]
+
+
+# Memoized check_mortgage_eligibility for one session. It remembers each rule's outcome
+# and the inputs it saw; when details change, only the rules reading a changed field are
+# re-checked, and the result is rebuilt once per change instead of on every call. Views
+# that derive more from the result (see intents.py) may store it in the dict, which
+# lives until the next change.
+class Evaluation:
+    __slots__ = ("product", "plan", "values", "failures", "bitmask", "_result", "checks", "hits")
+
+    def __init__(self, product: str = "default"):
+        self.product = product
+        self.plan = None
+        self.values = {}
+        # rule id -> the rule's bit when it fails, else 0
+        self.failures = {}
+        # Failure bitmask of the last result
+        self.bitmask = 0
+        self._result = None
+        self.checks = 0
+        self.hits = 0
+
+    def result(self, details: dict) -> dict:
+        plan = get_plan(self.product)
+        if plan is not self.plan:
+            # New or reloaded rule set: nothing cached applies
+            self.plan, self.values, self._result = plan, {}, None
+            self.failures = dict.fromkeys(plan.by_id)
+
+        values = self.values
+        stale = {}
+        for field, rules in plan.dependents.items():
+            value = details.get(field)
+            if value != values.get(field):
+                stale.update(dict.fromkeys(rules))
+                if value is None:
+                    del values[field]
+                else:
+                    values[field] = value
+        if self._result is not None and not stale:
+            self.hits += 1
+            return self._result
+
+        if self._result is None:
+            stale = plan.rules
+        # Cleared first so a check that raises (e.g. a missing field) leaves nothing stale behind
+        self._result = None
+        # The reason templates may quote derived fields, so they are needed either way
+        prepared = plan.prepare(values)
+        failures = plan.evaluate_rules(prepared, stale)
+        for rule in stale:
+            self.failures[rule.id] = failures & rule.bit
+        self.checks += len(stale)
+
+        self.bitmask = sum(self.failures.values())
+        self._result = _result(plan, self.bitmask, prepared)
+        return self._result
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import audit
+from conversation import approx_tokens, summarize
+from eligibility import FIELDS, OPTIONAL_FIELDS, evaluate_applicant, invalid_rows
+from llm import DEFAULT_MODEL, PROMPT_TEMPLATE, acached_invoke, chain_settings, get_chain, prompt_inputs, prompt_key
+
+logger = logging.getLogger(__name__)
+
+# Personalized LLM explanations for a whole batch of applicants, concurrently:
+#   python explanations.py ineligible.csv explanations.jsonl --concurrency 16
+# Identical prompts are sent once. Requests go through token buckets sized to the Groq
+# quota (requests and tokens per minute), at most `concurrency` are in flight, and
+# rate-limit or transient errors are retried with exponential backoff and full jitter.
+# A 429 pauses every worker for the server's retry-after, not just the one that got it.
+
+# Default to the Groq free tier; set these to your account's limits
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "5000"))
+# Tokens budgeted for each reply on top of the prompt
+COMPLETION_TOKENS = 200
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRY_ERRORS = ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError")
+
+
+# Async token bucket: `rate` tokens per second, bursts of up to `capacity`
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    # Stop handing out tokens for `seconds`, e.g. after the server says we are over quota
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+def _status(exc):
+    status = getattr(exc, "status_code", None)
+    response = getattr(exc, "response", None)
+    return status if status is not None else getattr(response, "status_code", None)
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return float(headers[header]) / scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def retryable(exc) -> bool:
+    return _status(exc) in RETRY_STATUS or type(exc).__name__ in RETRY_ERRORS
+
+
+class ExplanationPipeline:
+    def __init__(self, chain=None, concurrency: int = 8, rpm: float = GROQ_RPM, tpm: float = GROQ_TPM,
+                 max_retries: int = 6, base_delay: float = 0.5, max_delay: float = 30.0, timeout: float = 60.0):
+        # Retries happen here, where they respect the rate limiter; the client should not retry on its own
+        self.chain = chain or get_chain(DEFAULT_MODEL, temperature=0, max_retries=0)
+        self.concurrency = concurrency
+        self.requests = TokenBucket(rpm / 60, capacity=max(1.0, rpm / 60 * concurrency))
+        self.tokens = TokenBucket(tpm / 60, capacity=tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.stats = {"prompts": 0, "unique": 0, "calls": 0, "retries": 0, "throttled": 0, "failed": 0}
+
+    async def _explain(self, inputs: dict, prompt_tokens: int):
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire()
+            await self.tokens.acquire(prompt_tokens + COMPLETION_TOKENS)
+            self.stats["calls"] += 1
+            try:
+                return await asyncio.wait_for(acached_invoke(self.chain, inputs), self.timeout)
+            except Exception as exc:
+                if not (retryable(exc) or isinstance(exc, asyncio.TimeoutError)) or attempt == self.max_retries:
+                    raise
+                retry_after = _retry_after(exc)
+                if _status(exc) == 429:
+                    self.stats["throttled"] += 1
+                    # Everyone backs off, otherwise the other workers keep hitting the limit
+                    self.requests.pause(retry_after or self.base_delay)
+                # Full jitter: a random delay up to the exponential backoff cap
+                delay = max(retry_after or 0.0, random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                self.stats["retries"] += 1
+                logger.debug("retrying after %s (attempt %d, %.2fs)", type(exc).__name__, attempt + 1, delay)
+                await asyncio.sleep(delay)
+
+    # Explanations for each applicant, in input order; None where the call kept failing
+    async def explain(self, applicants) -> list:
+        applicants = list(applicants)
+        # Group applicants by prompt so each distinct prompt is requested once
+        keys = []
+        prompts = {}
+        settings = chain_settings(self.chain)
+        for details in applicants:
+            inputs = prompt_inputs(details, "eligibility_check", {"summary": summarize(details)})
+            key = prompt_key(inputs, *settings)
+            keys.append(key)
+            if key not in prompts:
+                prompts[key] = (inputs, approx_tokens(PROMPT_TEMPLATE.format(**inputs)))
+        self.stats["prompts"] += len(keys)
+        self.stats["unique"] += len(prompts)
+
+        # Failure bitmasks for the audit log, None for rows missing or with invalid inputs
+        columns = {field: [details.get(field, np.nan) for details in applicants] for field in FIELDS + OPTIONAL_FIELDS}
+        invalid = invalid_rows(columns).tolist() if applicants else []
+        failures = [None if bad else evaluate_applicant(details)[0] for details, bad in zip(applicants, invalid)]
+        if any(invalid):
+            logger.warning("%d applicants with missing or invalid inputs are not audited", sum(invalid))
+
+        # A bounded queue feeding a fixed set of workers keeps memory flat for large batches
+        queue = asyncio.Queue(maxsize=2 * self.concurrency)
+        results = {}
+        latencies = {}
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                key, (inputs, prompt_tokens) = item
+                started = time.perf_counter()
+                try:
+                    results[key] = await self._explain(inputs, prompt_tokens)
+                    latencies[key] = time.perf_counter() - started
+                except Exception as exc:
+                    self.stats["failed"] += 1
+                    logger.warning("explanation failed: %s", exc)
+                    results[key] = None
+                queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        for item in prompts.items():
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+        # Each applicant's explanation is audited, including the ones that shared a request.
+        # Off the event loop, since a full audit queue may block. A failed audit record is
+        # logged and never costs the explanations.
+        def record():
+            for details, key, failed in zip(applicants, keys, failures):
+                if results[key] is None or failed is None:
+                    continue
+                try:
+                    audit.record_explanation(details, failed, results[key], settings[0], latencies[key])
+                except Exception as exc:
+                    logger.warning("audit record failed: %s", exc)
+
+        await asyncio.to_thread(record)
+        return [results[key] for key in keys]
+
+
+def explain_applicants(applicants, **options) -> list:
+    return asyncio.run(ExplanationPipeline(**options).explain(applicants))
+
+
+# Applicant fields from a CSV; other columns (ids, names, ...) are ignored
+def read_applicants(path: str) -> list:
+    import csv
+
+    wanted = FIELDS + OPTIONAL_FIELDS
+    with open(path, newline="") as file:
+        return [
+            {field: float(value) for field, value in row.items() if field in wanted and value not in ("", None)}
+            for row in csv.DictReader(file)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate LLM explanations for a CSV of applicants")
+    parser.add_argument("input", help="CSV with income, credit_score, loan_amount, property_value")
+    parser.add_argument("output", help="JSON lines file to write, one explanation per applicant")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=GROQ_RPM, help="requests per minute allowed by the quota")
+    parser.add_argument("--tpm", type=float, default=GROQ_TPM, help="tokens per minute allowed by the quota")
+    args = parser.parse_args()
+
+    applicants = read_applicants(args.input)
+    pipeline = ExplanationPipeline(concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm)
+    started = time.perf_counter()
+    explanations = asyncio.run(pipeline.explain(applicants))
+    with open(args.output, "w") as file:
+        for row, explanation in enumerate(explanations):
+            file.write(json.dumps({"row": row, "explanation": explanation}) + "\n")
+    print(f"Explained {len(applicants):,} applicants in {time.perf_counter() - started:.1f}s: {pipeline.stats}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import cProfile
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+# Per-stage latency instrumentation. Code marks a stage with
+#     with span("llm.call"):
+#         ...
+# and each stage's durations go into an HDR-style histogram. Export with
+# prometheus_text() or write_json(). Nothing is recorded unless INSTRUMENTATION=1
+# (or enable() is called); a disabled span is a shared no-op object, so the
+# instrumented code costs one attribute lookup and an empty with-block.
+#
+# profiled() adds sampled cProfile capture: a fraction of requests run under the
+# profiler, and those slower than a threshold are dumped to PROFILE_DIR as .prof files.
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Set to have maybe_write_json() keep a JSON snapshot there, at most every JSON_INTERVAL seconds
+JSON_PATH = os.getenv("INSTRUMENTATION_JSON") or None
+JSON_INTERVAL = float(os.getenv("INSTRUMENTATION_JSON_INTERVAL", "10"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+PROFILE_THRESHOLD = float(os.getenv("PROFILE_THRESHOLD_MS", "500")) / 1000
+
+# Log-linear buckets: values below 2 * SUB_BUCKETS microseconds are exact, above that
+# each power of two is split into SUB_BUCKETS buckets (about 3% relative error)
+SUB_BUCKETS = 32
+SUB_BITS = 5
+MAX_SHIFT = 40
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+enabled = os.getenv("INSTRUMENTATION", "0") == "1"
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def _bucket(value: int) -> int:
+    if value < 2 * SUB_BUCKETS:
+        return max(value, 0)
+    shift = min(value.bit_length() - SUB_BITS - 1, MAX_SHIFT)
+    return shift * SUB_BUCKETS + min(value >> shift, 2 * SUB_BUCKETS - 1)
+
+
+# Smallest and largest value that land in a bucket
+def _bucket_range(index: int) -> tuple:
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index - shift * SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+# Latency histogram over integer microseconds with constant-time record()
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * ((MAX_SHIFT + 2) * SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, microseconds: int):
+        index = _bucket(microseconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += microseconds
+            if self.min is None or microseconds < self.min:
+                self.min = microseconds
+            if microseconds > self.max:
+                self.max = microseconds
+
+    # Value at quantile q (0..1), accurate to the bucket width
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, round(q * self.count))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    low, high = _bucket_range(index)
+                    return min(max((low + high) / 2, self.min), self.max)
+            return float(self.max)
+
+    def merge(self, other: "Histogram"):
+        with self._lock:
+            for index, count in enumerate(other.counts):
+                self.counts[index] += count
+            self.count += other.count
+            self.total += other.total
+            if other.min is not None and (self.min is None or other.min < self.min):
+                self.min = other.min
+            self.max = max(self.max, other.max)
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count / 1000 if self.count else 0.0,
+            "min_ms": (self.min or 0) / 1000,
+            "max_ms": self.max / 1000,
+            **{f"p{q * 100:g}_ms": self.quantile(q) / 1000 for q in QUANTILES},
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(name: str) -> Histogram:
+    result = _histograms.get(name)
+    if result is None:
+        with _histograms_lock:
+            result = _histograms.setdefault(name, Histogram())
+    return result
+
+
+# Record a duration measured elsewhere, e.g. time to first token
+def record(name: str, seconds: float):
+    if enabled:
+        histogram(name).record(int(seconds * 1e6))
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        histogram(self.name).record((time.perf_counter_ns() - self.started) // 1000)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+# Time the enclosed block into the histogram called name
+def span(name: str):
+    return _Span(name) if enabled else _NO_SPAN
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def snapshot() -> dict:
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    return {name: hist.summary() for name, hist in items}
+
+
+def _metric_name(name: str) -> str:
+    return "mortgage_" + "".join(c if c.isalnum() else "_" for c in name) + "_seconds"
+
+
+# Prometheus text exposition format, one summary per stage
+def prometheus_text() -> str:
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    lines = []
+    for name, hist in items:
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} summary")
+        for q in QUANTILES:
+            lines.append(f'{metric}{{quantile="{q}"}} {hist.quantile(q) / 1e6:.6f}')
+        lines.append(f"{metric}_sum {hist.total / 1e6:.6f}")
+        lines.append(f"{metric}_count {hist.count}")
+    return "\n".join(lines) + "\n"
+
+
+# Write snapshot() to a JSON file atomically
+def write_json(path: str):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump({"time": time.time(), "stages": snapshot()}, file, indent=2)
+    os.replace(temporary, path)
+
+
+_last_json_write = 0.0
+
+
+# For processes without a scrape endpoint (the Streamlit apps): refresh JSON_PATH now and then
+def maybe_write_json():
+    global _last_json_write
+    if not enabled or JSON_PATH is None:
+        return
+    now = time.monotonic()
+    if now - _last_json_write >= JSON_INTERVAL:
+        _last_json_write = now
+        write_json(JSON_PATH)
+
+
+_profile_lock = threading.Lock()
+_profile_ids = itertools.count()
+
+
+class _Profiled:
+    __slots__ = ("name", "threshold", "profiler", "started")
+
+    def __init__(self, name: str, threshold: float):
+        self.name = name
+        self.threshold = threshold
+        self.profiler = None
+
+    def __enter__(self):
+        # One profiler at a time; concurrent requests are simply not sampled
+        if _profile_lock.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+            _profile_lock.release()
+            if elapsed >= self.threshold:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                path = os.path.join(PROFILE_DIR, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-"
+                                                 f"{next(_profile_ids)}-{elapsed * 1000:.0f}ms.prof")
+                self.profiler.dump_stats(path)
+        return False
+
+
+# Profile a sample_rate fraction of calls and keep those slower than threshold seconds;
+# inspect the dumps with python -m pstats profiles/<file>.prof
+def profiled(name: str, threshold: float = None, sample_rate: float = None):
+    if enabled and random.random() < (PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate):
+        return _Profiled(name, PROFILE_THRESHOLD if threshold is None else threshold)
+    return _NO_SPAN
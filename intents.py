@@ -0,0 +1,233 @@
+import re
+import threading
+import time
+from types import GeneratorType
+
+import amortization
+from solver import boundaries, improvement_suggestions
+
+# Local intent router for the chat apps. Common turns ("why", "what's my max loan",
+# "how do I improve", a plain number) are answered straight from the eligibility
+# result; only messages that match no known intent are sent to the LLM.
+#
+# Classification is a single compiled regex over every keyword phrase (one pass over
+# the message), followed by a small weighted vote: each matched phrase adds its weight
+# to an intent, and the best intent wins if it reaches MIN_SCORE. The "open" pseudo
+# intent collects general-knowledge phrasing; when it wins, the turn goes to the LLM.
+
+MIN_SCORE = 1.0
+
+# intent -> {phrase: weight}; phrases are matched on word boundaries, case-insensitively
+KEYWORDS = {
+    "verdict": {
+        "eligible": 1.0, "eligibility": 1.0, "check": 1.0, "qualify": 1.0, "result": 1.0,
+        "status": 1.0, "approved": 1.0, "am i": 0.5,
+    },
+    "reasons": {
+        "why": 2.0, "explain": 2.0, "reason": 2.0, "reasons": 2.0, "what went wrong": 2.0,
+        "ineligible": 1.0, "rejected": 1.5, "not eligible": 1.0,
+    },
+    "suggestions": {
+        "suggest": 2.5, "suggestion": 2.5, "suggestions": 2.5, "improve": 2.5, "tips": 2.0,
+        "advice": 2.0, "what can i do": 2.5, "what should i do": 2.5, "how can i": 1.5,
+        "how do i": 1.5, "better": 1.0, "chances": 1.0,
+    },
+    "max_loan": {
+        "max loan": 3.0, "maximum loan": 3.0, "max loan amount": 3.0, "loan limit": 3.0,
+        "how much can i borrow": 3.0, "borrow": 2.0, "afford": 2.0, "how much loan": 3.0,
+    },
+    "emi": {
+        "emi": 3.0, "monthly payment": 3.0, "instalment": 3.0, "installment": 3.0,
+        "pay per month": 3.0, "pay each month": 3.0,
+    },
+    "details": {
+        "my details": 3.0, "what did i enter": 3.0, "my information": 3.0, "my info": 3.0,
+        "summary": 2.0,
+    },
+    "greeting": {"hi": 1.0, "hello": 1.0, "hey": 1.0, "good morning": 1.0, "good evening": 1.0},
+    "thanks": {"thanks": 2.0, "thank you": 2.0, "thx": 2.0, "great": 1.0, "ok": 1.0, "okay": 1.0, "cool": 1.0},
+    "open": {
+        "what is": 1.5, "what are": 1.5, "what's a": 1.5, "how does": 2.0, "how do mortgages": 3.0,
+        "difference between": 3.0, "tell me about": 2.0, "in general": 2.0, "compare": 2.0,
+        "should i": 1.5, "is it better": 3.0, "fixed or floating": 3.0,
+    },
+}
+
+# Priority for ties, most specific first
+PRIORITY = ("max_loan", "emi", "suggestions", "reasons", "details", "verdict", "open", "thanks", "greeting")
+
+PHRASES = {phrase: (intent, weight) for intent, phrases in KEYWORDS.items() for phrase, weight in phrases.items()}
+
+# Longest phrases first so "max loan amount" wins over "max loan" at the same position
+_AUTOMATON = re.compile(
+    r"\b(?:" + "|".join(re.escape(phrase) for phrase in sorted(PHRASES, key=len, reverse=True)) + r")\b"
+)
+_NUMBER = re.compile(r"^\s*(?:₹|rs\.?|inr)?\s*[\d,]+(?:\.\d+)?\s*(?:k|l|lakh|lakhs|inr|rs|rupees)?\s*$", re.IGNORECASE)
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'"})
+
+
+# Intent name for a message, or None when it should go to the LLM
+def classify(message: str):
+    text = message.lower().translate(_APOSTROPHES)
+    # A bare number is the answer to the last question in the flow
+    if _NUMBER.match(text):
+        return "verdict"
+
+    scores = {}
+    for match in _AUTOMATON.finditer(text):
+        intent, weight = PHRASES[match.group()]
+        scores[intent] = scores.get(intent, 0.0) + weight
+    if not scores:
+        return None
+    best = max(scores.values())
+    if best < MIN_SCORE:
+        return None
+    intent = next(name for name in PRIORITY if scores.get(name) == best)
+    return None if intent == "open" else intent
+
+
+def _money(value) -> str:
+    return f"{float(value):,.0f}"
+
+
+# How each detail is shown; anything not listed is an amount in whole rupees
+DETAIL_FORMATS = {
+    "credit_score": "{:.0f}",
+    "interest_rate": "{:g}%",
+    "tenure_months": "{:.0f}",
+}
+
+
+def _verdict(details, eligibility_info):
+    if eligibility_info["eligible"]:
+        return eligibility_info["message"]
+    return eligibility_info["message"] + " Would you like to know why or get suggestions for improvement?"
+
+
+def _reasons(details, eligibility_info):
+    if eligibility_info["eligible"]:
+        return "You're already eligible for a mortgage loan."
+    return "Here’s why you're ineligible: " + "; ".join(eligibility_info["reasons"])
+
+
+def _suggestions(details, eligibility_info):
+    # Kept on the result, so a memoized session result computes them once per change of details
+    suggestions = eligibility_info.get("improvements")
+    if suggestions is None:
+        suggestions = eligibility_info["improvements"] = improvement_suggestions(details)
+    if not suggestions:
+        return "You already meet every requirement, so there is nothing to improve."
+    return "Here are some suggestions to improve your eligibility: " + "; ".join(suggestions)
+
+
+def _max_loan(details, eligibility_info):
+    if details.get("property_value") is None:
+        return None
+    limit = boundaries(details).get("max_loan_amount")
+    if limit is None:
+        return None
+    answer = f"The most you can borrow against a property worth {_money(details['property_value'])} is {_money(limit)} INR."
+    loan = details.get("loan_amount")
+    if loan is not None and loan > limit:
+        answer += f" Your requested {_money(loan)} is {_money(loan - limit)} over that."
+    return answer
+
+
+# Needs the rate and term; without them the LLM can ask for them
+def _emi(details, eligibility_info):
+    if any(details.get(field) is None for field in ("loan_amount", "interest_rate", "tenure_months")):
+        return None
+    emi = amortization.emi(details["loan_amount"], details["interest_rate"], details["tenure_months"])
+    return (
+        f"Your EMI would be {_money(emi)} INR a month for {_money(details['loan_amount'])} "
+        f"at {details['interest_rate']}% over {details['tenure_months']} months."
+    )
+
+
+def _details(details, eligibility_info):
+    if not details:
+        return "You haven't entered any details yet."
+    return "Here are the details you provided: " + "; ".join(
+        f"{name.replace('_', ' ')}: {DETAIL_FORMATS.get(name, '{:,.0f}').format(float(value))}"
+        for name, value in details.items()
+    )
+
+
+ANSWERS = {
+    "verdict": _verdict,
+    "reasons": _reasons,
+    "suggestions": _suggestions,
+    "max_loan": _max_loan,
+    "emi": _emi,
+    "details": _details,
+    "greeting": lambda details, eligibility_info: "Hello! Ask me why you're eligible or not, how to improve, or your maximum loan.",
+    "thanks": lambda details, eligibility_info: "You're welcome! Let me know if there's anything else I can help with.",
+}
+
+
+# Local answer for a message, or None when it needs the LLM
+def answer(message: str, details: dict, eligibility_info: dict):
+    intent = classify(message)
+    if intent is None:
+        return None
+    return ANSWERS[intent](details, eligibility_info)
+
+
+# How many turns were answered locally and how long each path took
+class RouterStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.remote = 0
+        self.local_seconds = 0.0
+        self.remote_seconds = 0.0
+
+    def record(self, local: bool, seconds: float):
+        with self._lock:
+            if local:
+                self.local += 1
+                self.local_seconds += seconds
+            else:
+                self.remote += 1
+                self.remote_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            turns = self.local + self.remote
+            local_ms = self.local_seconds / self.local * 1000 if self.local else 0.0
+            remote_ms = self.remote_seconds / self.remote * 1000 if self.remote else 0.0
+            return {
+                "turns": turns,
+                "local": self.local,
+                "remote": self.remote,
+                "local_fraction": self.local / turns if turns else 0.0,
+                "mean_local_ms": local_ms,
+                "mean_remote_ms": remote_ms,
+                # Estimated from the mean LLM turn each local answer avoided
+                "saved_ms": self.local * max(remote_ms - local_ms, 0.0),
+            }
+
+
+stats = RouterStats()
+
+
+# Streamed replies are timed when the last token has been consumed
+def _timed_stream(tokens, started):
+    try:
+        yield from tokens
+    finally:
+        stats.record(False, time.perf_counter() - started)
+
+
+# Answer locally when possible, otherwise call fallback() (the LLM) and return its reply
+def respond(message: str, details: dict, eligibility_info: dict, fallback):
+    started = time.perf_counter()
+    reply = answer(message, details, eligibility_info)
+    if reply is not None:
+        stats.record(True, time.perf_counter() - started)
+        return reply
+    reply = fallback()
+    if isinstance(reply, GeneratorType):
+        return _timed_stream(reply, started)
+    stats.record(False, time.perf_counter() - started)
+    return reply
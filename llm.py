@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+import time
+
+from instrumentation import record, span
+from response_cache import ResponseCache, cache_key, normalize_inputs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "mixtral-8x7b-32768"
+
+PROMPT_TEMPLATE = """
+    You are an assistant helping users determine if they are eligible for a mortgage loan based on the details they provided.
+
+    User provided the following details so far:
+    - Income: {income}
+    - Credit Score: {credit_score}
+    - Loan Amount: {loan_amount}
+    - Property Value: {property_value}
+
+    Summary of the conversation so far: {summary}
+
+    Most recent messages:
+    {history}
+
+    Relevant lending policy excerpts (base policy answers on these and cite the page):
+    {policy}
+
+    Your task is to continue the conversation, ask the user for more details step by step, and determine eligibility.
+
+    Next Step: {next_step}
+    """
+
+# Keep-alive pool shared by every request a client makes
+POOL_LIMITS = {"max_connections": 32, "max_keepalive_connections": 32, "keepalive_expiry": 60}
+
+_chains = {}
+_chains_lock = threading.Lock()
+
+# Process-wide response cache; set RESPONSE_CACHE_PATH to share entries across workers
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    disk_path=os.getenv("RESPONSE_CACHE_PATH") or None,
+)
+
+
+# Fill the prompt variables from whatever details have been collected so far.
+# context carries the conversation summary and recent messages (see conversation.prompt_context)
+# and, for open questions, policy excerpts (see policy_docs.policy_context).
+def prompt_inputs(user_details: dict, next_step: str, context: dict = None) -> dict:
+    context = context or {}
+    return {
+        "income": user_details.get("income", "Not provided yet"),
+        "credit_score": user_details.get("credit_score", "Not provided yet"),
+        "loan_amount": user_details.get("loan_amount", "Not provided yet"),
+        "property_value": user_details.get("property_value", "Not provided yet"),
+        "next_step": next_step,
+        "summary": context.get("summary", "No earlier conversation."),
+        "history": context.get("history", "(none)"),
+        "policy": context.get("policy", "None available."),
+    }
+
+
+# Build a new prompt | llm | parser chain with its own pooled HTTP client.
+# LangChain and Groq are imported here, on first use, so paths that never reach
+# the LLM do not pay for their import graph at start-up.
+def build_chain(model: str = DEFAULT_MODEL, temperature: float = 0, base_url: str = None, max_retries: int = None):
+    import httpx
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_groq import ChatGroq
+
+    options = {"http_client": httpx.Client(limits=httpx.Limits(**POOL_LIMITS))}
+    if base_url:
+        options["base_url"] = base_url
+    if max_retries is not None:
+        options["max_retries"] = max_retries
+
+    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    llm = ChatGroq(model=model, temperature=temperature, api_key=os.getenv("GROQ_API_KEY"), **options)
+    return prompt | llm | StrOutputParser()
+
+
+# Process-wide chain registry keyed by model, temperature, endpoint and client retry policy
+def get_chain(model: str = DEFAULT_MODEL, temperature: float = 0, base_url: str = None, max_retries: int = None):
+    key = (model, float(temperature), base_url, max_retries)
+    chain = _chains.get(key)
+    if chain is None:
+        with _chains_lock:
+            chain = _chains.get(key)
+            if chain is None:
+                chain = _chains[key] = build_chain(model, temperature, base_url, max_retries)
+    return chain
+
+
+# Drop every cached chain, e.g. after the API key changes
+def clear_chains():
+    with _chains_lock:
+        _chains.clear()
+
+
+def _log_stream(started: float, first_token: float, timings: dict):
+    now = time.perf_counter()
+    ttft_ms = (first_token - started) * 1000 if first_token else None
+    total_ms = (now - started) * 1000
+    if ttft_ms is not None:
+        record("llm.ttft", ttft_ms / 1000)
+    record("llm.stream", total_ms / 1000)
+    if timings is not None:
+        timings["ttft_ms"] = ttft_ms
+        timings["total_ms"] = total_ms
+    logger.info("llm stream ttft_ms=%s total_ms=%.1f", "%.1f" % ttft_ms if ttft_ms else "-", total_ms)
+
+
+# Stream the chain's output token by token, recording time to first token and total latency
+def stream_chain(chain, inputs: dict, timings: dict = None):
+    started = time.perf_counter()
+    first_token = None
+    try:
+        for token in chain.stream(inputs):
+            if not token:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+            yield token
+    finally:
+        _log_stream(started, first_token, timings)
+
+
+# Async version of stream_chain for the API
+async def astream_chain(chain, inputs: dict, timings: dict = None):
+    started = time.perf_counter()
+    first_token = None
+    try:
+        async for token in chain.astream(inputs):
+            if not token:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+            yield token
+    finally:
+        _log_stream(started, first_token, timings)
+
+
+# (model, temperature) of the LLM a chain calls, so its replies are cached under the right key
+def chain_settings(chain) -> tuple:
+    for step in getattr(chain, "steps", (chain,)):
+        model = getattr(step, "model_name", None)
+        if model is not None:
+            return model, float(step.temperature or 0)
+    raise ValueError(f"Cannot tell which model {type(chain).__name__} calls")
+
+
+# Normalized inputs and cache key for one LLM turn
+def _cache_entry(inputs: dict, model: str, temperature: float):
+    with span("llm.prompt"):
+        inputs = normalize_inputs(inputs)
+        return inputs, cache_key(PROMPT_TEMPLATE.format(**inputs), model, temperature)
+
+
+# Response cache key of a prompt, e.g. to group identical prompts before calling the LLM
+def prompt_key(inputs: dict, model: str, temperature: float) -> str:
+    return _cache_entry(inputs, model, temperature)[1]
+
+
+# invoke() through the response cache; identical prompts only reach Groq once
+def cached_invoke(chain, inputs: dict) -> str:
+    inputs, key = _cache_entry(inputs, *chain_settings(chain))
+    response = response_cache.get(key)
+    if response is None:
+        with span("llm.call"):
+            response = chain.invoke(inputs)
+        response_cache.put(key, response)
+    return response
+
+
+async def acached_invoke(chain, inputs: dict) -> str:
+    inputs, key = _cache_entry(inputs, *chain_settings(chain))
+    response = response_cache.get(key)
+    if response is None:
+        with span("llm.call"):
+            response = await chain.ainvoke(inputs)
+        response_cache.put(key, response)
+    return response
+
+
+# Cached reply as a plain string, or a token stream that fills the cache once it completes
+def cached_stream(chain, inputs: dict, timings: dict = None):
+    inputs, key = _cache_entry(inputs, *chain_settings(chain))
+    response = response_cache.get(key)
+    if response is not None:
+        return response
+    return _stream_into_cache(stream_chain(chain, inputs, timings), key)
+
+
+def _stream_into_cache(tokens, key):
+    parts = []
+    for token in tokens:
+        parts.append(token)
+        yield token
+    response_cache.put(key, "".join(parts))
+
+
+# Async token stream through the cache; a hit arrives as a single chunk
+async def acached_stream(chain, inputs: dict, timings: dict = None):
+    inputs, key = _cache_entry(inputs, *chain_settings(chain))
+    response = response_cache.get(key)
+    if response is not None:
+        if timings is not None:
+            timings["cached"] = True
+        yield response
+        return
+
+    parts = []
+    async for token in astream_chain(chain, inputs, timings):
+        parts.append(token)
+        yield token
+    response_cache.put(key, "".join(parts))
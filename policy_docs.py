@@ -0,0 +1,343 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import numpy as np
+
+from instrumentation import record, span
+
+logger = logging.getLogger(__name__)
+
+# Lending policy retrieval for grounding LLM answers, fully offline:
+#   python policy_docs.py ingest policies/*.pdf
+# Ingestion extracts each page's text (PyMuPDF for PDFs; .txt/.md files use form feeds
+# as page breaks), splits pages into overlapping word windows and embeds the chunks in
+# batches. Embeddings are cached in SQLite by a hash of the chunk text and model, so
+# re-ingesting re-embeds only pages whose text changed. The index is a normalized
+# float32 matrix searched exactly with one matrix-vector product: policy corpora are a
+# few thousand chunks, where that takes well under a millisecond.
+#
+# Each ingest writes a new build into its own subdirectory of the index directory and
+# then atomically replaces the CURRENT file naming it, so a reader loading the index
+# never pairs one build's embeddings with another's chunks.
+#
+# At answer time search() has a strict latency budget. The query is embedded on a
+# worker thread; when the budget runs out, the turn goes ahead without policy context.
+
+POLICY_INDEX_DIR = os.getenv("POLICY_INDEX_DIR", "policy_index")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embeddings.db")
+# A sentence-transformers model name or local path; it must already be downloaded
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+POLICY_BUDGET_MS = float(os.getenv("POLICY_BUDGET_MS", "50"))
+
+CURRENT = "CURRENT"
+CHUNK_WORDS = 160
+OVERLAP_WORDS = 40
+# Hits scoring below this are not worth the prompt tokens
+MIN_SCORE = 0.3
+
+
+# Embeds with a local sentence-transformers model, never downloading at runtime
+class SentenceTransformerEmbedder:
+    def __init__(self, model: str = EMBEDDING_MODEL, device: str = None):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model, device=device, local_files_only=True)
+        self.name = model
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts, batch_size: int = 64) -> np.ndarray:
+        return self.model.encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+# Dependency-free lexical embedder: hashed word unigrams and bigrams, L2-normalized.
+# Cruder than a sentence model but instant; useful without the model files.
+class HashingEmbedder:
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def embed(self, texts, batch_size: int = 64) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9]+", text.lower())
+            for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def load_embedder(model: str = EMBEDDING_MODEL):
+    if model.startswith("hashing"):
+        _, _, dimension = model.partition("-")
+        return HashingEmbedder(int(dimension or 384))
+    return SentenceTransformerEmbedder(model)
+
+
+# (page number, text) for every page of a PDF, or of a text file split on form feeds
+def extract_pages(path: str):
+    if path.lower().endswith(".pdf"):
+        import pymupdf
+
+        with pymupdf.open(path) as document:
+            for number, page in enumerate(document, 1):
+                yield number, page.get_text("text")
+        return
+    with open(path, encoding="utf-8") as file:
+        yield from enumerate(file.read().split("\f"), 1)
+
+
+# Overlapping windows of CHUNK_WORDS words; chunks never span pages, so a page's chunks
+# and their cache keys depend on that page alone
+def chunk_text(text: str, size: int = CHUNK_WORDS, overlap: int = OVERLAP_WORDS) -> list:
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    return [" ".join(words[start:start + size]) for start in range(0, max(len(words) - overlap, 1), step)]
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+# Content-hash embedding cache on SQLite, shared by every ingestion run
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        conn = self._connection()
+        keys = list(keys)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            query = f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})"
+            for key, vector in conn.execute(query, batch):
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, items):
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                ((key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items),
+            )
+
+
+# Build the index in index_dir from the given files; returns counts and throughput
+def ingest(paths, embedder, index_dir: str = POLICY_INDEX_DIR, cache: EmbeddingCache = None,
+           batch_size: int = 64) -> dict:
+    cache = cache or EmbeddingCache()
+    started = time.perf_counter()
+    chunks = []
+    pages = 0
+    for path in paths:
+        for page, text in extract_pages(path):
+            pages += 1
+            chunks += [{"source": os.path.basename(path), "page": page, "text": chunk} for chunk in chunk_text(text)]
+
+    keys = [embedding_key(embedder.name, chunk["text"]) for chunk in chunks]
+    vectors = cache.get_many(set(keys))
+    missing = list(dict.fromkeys(key for key in keys if key not in vectors))
+    texts = {key: chunk["text"] for key, chunk in zip(keys, chunks)}
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        embedded = embedder.embed([texts[key] for key in batch], batch_size)
+        cache.put_many(zip(batch, embedded))
+        vectors.update(zip(batch, embedded))
+
+    matrix = np.empty((len(chunks), embedder.dimension), dtype=np.float32)
+    for row, key in enumerate(keys):
+        matrix[row] = vectors[key]
+    write_index(index_dir, embedder, matrix, chunks)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages": pages,
+        "chunks": len(chunks),
+        "embedded": len(missing),
+        "cached": len(chunks) - len(missing),
+        "seconds": elapsed,
+        "chunks_per_second": len(chunks) / elapsed if elapsed else 0.0,
+    }
+
+
+def write_index(index_dir: str, embedder, matrix: np.ndarray, chunks: list):
+    build = f"{time.time_ns():016x}"
+    directory = os.path.join(index_dir, build)
+    os.makedirs(directory)
+    np.save(os.path.join(directory, "embeddings.npy"), matrix)
+    with open(os.path.join(directory, "chunks.jsonl"), "w") as file:
+        file.write("".join(json.dumps(chunk) + "\n" for chunk in chunks))
+    with open(os.path.join(directory, "manifest.json"), "w") as file:
+        json.dump({"model": embedder.name, "dimension": embedder.dimension, "chunks": len(chunks),
+                   "built": time.time()}, file)
+
+    # The build goes live in one rename
+    temporary = os.path.join(index_dir, CURRENT + ".tmp")
+    with open(temporary, "w") as file:
+        file.write(build)
+    os.replace(temporary, os.path.join(index_dir, CURRENT))
+
+    # Keep the previous build for readers still loading it; older ones are removed
+    builds = sorted(name for name in os.listdir(index_dir) if os.path.isdir(os.path.join(index_dir, name)))
+    for name in builds[:max(0, builds.index(build) - 1)]:
+        shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+class PolicyIndex:
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="policy-embed")
+
+    def __init__(self, index_dir: str = POLICY_INDEX_DIR, embedder=None, budget_ms: float = POLICY_BUDGET_MS,
+                 query_cache_size: int = 1024):
+        with open(os.path.join(index_dir, CURRENT)) as file:
+            index_dir = os.path.join(index_dir, file.read().strip())
+        with open(os.path.join(index_dir, "manifest.json")) as file:
+            self.manifest = json.load(file)
+        self.embedder = embedder or load_embedder(self.manifest["model"])
+        if self.embedder.name != self.manifest["model"]:
+            raise ValueError(f"Index was built with {self.manifest['model']}, not {self.embedder.name}")
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "chunks.jsonl")) as file:
+            self.chunks = [json.loads(line) for line in file]
+        self.budget_ms = budget_ms
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.timeouts = 0
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            self._queries[query] = vector
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    # Best chunks for a query as dicts with source, page, text and score. Returns [] when
+    # the query cannot be embedded within the budget. A timed-out query still waiting for
+    # the worker is cancelled so later queries do not queue behind it; one already being
+    # embedded finishes and is cached, so a repeat of the question is answered.
+    def search(self, query: str, k: int = 3, min_score: float = MIN_SCORE, budget_ms: float = None) -> list:
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000
+        started = time.perf_counter()
+        self.searches += 1
+        with span("policy.search"):
+            with self._lock:
+                vector = self._queries.get(query)
+                if vector is not None:
+                    self._queries.move_to_end(query)
+            if vector is None:
+                try:
+                    future = self._executor.submit(self._embed_query, query)
+                    vector = future.result(timeout=None if budget == float("inf") else budget)
+                except TimeoutError:
+                    future.cancel()
+                    self.timeouts += 1
+                    record("policy.timeout", time.perf_counter() - started)
+                    return []
+            scores = self.embeddings @ vector
+            k = min(k, len(scores))
+            if not k:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [dict(self.chunks[row], score=float(scores[row])) for row in top if scores[row] >= min_score]
+
+
+_index = None
+_loader = None
+_index_lock = threading.Lock()
+
+
+def _load_index():
+    global _index
+    try:
+        index = PolicyIndex()
+        # The model's first encode is slow as well; pay it here rather than in a query's budget
+        index.embedder.embed(["policy"])
+        _index = index
+    except (OSError, ImportError, ValueError) as exc:
+        logger.info("Policy retrieval disabled: %s", exc)
+        _index = False
+
+
+# Start loading the process-wide index and its model in a background thread, once.
+# Apps call this at startup so the first question does not wait for the model.
+def load_index() -> threading.Thread:
+    global _loader
+    with _index_lock:
+        if _loader is None:
+            _loader = threading.Thread(target=_load_index, name="policy-index", daemon=True)
+            _loader.start()
+    return _loader
+
+
+# The process-wide index, or None when none has been built, its embedder cannot load,
+# or it is still loading (the first call starts the load)
+def get_index():
+    if _index is None:
+        load_index()
+    return _index or None
+
+
+# Policy excerpts for the prompt, or a placeholder when there is no index or no hit
+def policy_context(query: str, k: int = 3) -> str:
+    index = get_index()
+    hits = index.search(query, k) if index is not None else []
+    if not hits:
+        return "None available."
+    return "\n".join(f"[{hit['source']} p.{hit['page']}] {hit['text']}" for hit in hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local policy document index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("ingest", help="extract, chunk and embed policy documents")
+    build.add_argument("paths", nargs="+", help="PDF, .txt or .md files")
+    build.add_argument("--batch-size", type=int, default=64)
+    search = commands.add_parser("search", help="print the best chunks for a question")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=3)
+    for command in (build, search):
+        command.add_argument("--index", default=POLICY_INDEX_DIR)
+        command.add_argument("--model", default=EMBEDDING_MODEL, help="sentence-transformers model, or hashing-<dim>")
+    args = parser.parse_args()
+
+    embedder = load_embedder(args.model)
+    if args.command == "ingest":
+        stats = ingest(args.paths, embedder, args.index, batch_size=args.batch_size)
+        print(f"{stats['pages']:,} pages, {stats['chunks']:,} chunks ({stats['embedded']:,} embedded, "
+              f"{stats['cached']:,} cached) in {stats['seconds']:.1f}s", file=sys.stderr)
+    else:
+        # No budget from the command line: the first query also loads the model
+        for hit in PolicyIndex(args.index, embedder).search(args.query, args.k, min_score=-1.0, budget_ms=float("inf")):
+            print(f"{hit['score']:.3f}  {hit['source']} p.{hit['page']}: {hit['text'][:200]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_CATALOG = os.getenv(
+    "PRODUCT_CATALOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog", "products.json")
+)
+
+# Matching applicants against a catalog of lender products without scanning it.
+# Each dimension is one threshold per product. Sorting the thresholds makes the set
+# of products an applicant clears on that dimension a prefix of the sorted order,
+# found by binary search. Prefix sets are kept as bitsets at every STRIDE-th rank
+# (plus the sorted order for the bits in between), so one dimension costs a search,
+# a row copy and at most STRIDE - 1 bit sets. The dimensions are intersected with a
+# bitwise AND over len(catalog) / 64 words.
+#
+# Products are numbered by rank (lowest rate first), so reading the set bits of the
+# intersection in order gives the qualifying products already ranked.
+
+# (applicant value, product threshold, op): the applicant qualifies when value OP threshold
+DIMENSIONS = (
+    ("income", "min_income", ">="),
+    ("credit_score", "min_credit_score", ">="),
+    ("ltv", "max_ltv", "<="),
+    ("loan_amount", "max_loan_amount", "<="),
+)
+STRIDE = 64
+# Applicants matched per block in match_batch, bounding the (applicants, words) bitsets
+BLOCK_ROWS = 4096
+_OFFSETS = np.arange(STRIDE - 1)
+
+
+class Product(NamedTuple):
+    id: str
+    lender: str
+    name: str
+    rate: float
+    min_income: float
+    min_credit_score: float
+    max_ltv: float
+    max_loan_amount: float
+
+
+def load_catalog(path: str = PRODUCT_CATALOG) -> list:
+    with open(path, encoding="utf-8") as file:
+        specs = json.load(file)["products"]
+    products = [
+        Product(
+            id=spec["id"],
+            lender=spec["lender"],
+            name=spec["name"],
+            rate=float(spec["rate"]),
+            min_income=float(spec.get("min_income", 0)),
+            min_credit_score=float(spec.get("min_credit_score", 0)),
+            max_ltv=float(spec.get("max_ltv", np.inf)),
+            max_loan_amount=float(spec.get("max_loan_amount", np.inf)),
+        )
+        for spec in specs
+    ]
+    if len({product.id for product in products}) != len(products):
+        raise ValueError("Product ids must be unique")
+    return products
+
+
+# Sorted thresholds for one dimension and the prefix bitsets over them
+class _Dimension:
+    def __init__(self, thresholds: np.ndarray, op: str, words: int):
+        # Keys ascend in the order products qualify: lowest minimum, or highest maximum, first
+        self.sign = 1.0 if op == ">=" else -1.0
+        self.order = np.argsort(self.sign * thresholds, kind="stable")
+        self.keys = (self.sign * thresholds)[self.order]
+        checkpoints = len(thresholds) // STRIDE + 1
+        self.prefixes = np.zeros((checkpoints, words), dtype=np.uint64)
+        bits = np.zeros(words, dtype=np.uint64)
+        for rank, product in enumerate(self.order):
+            if rank % STRIDE == 0:
+                self.prefixes[rank // STRIDE] = bits
+            bits[product >> 6] |= np.uint64(1) << np.uint64(product & 63)
+        if len(thresholds) % STRIDE == 0:
+            self.prefixes[-1] = bits
+
+    # Number of products each applicant value clears; NaN clears none
+    def counts(self, values: np.ndarray) -> np.ndarray:
+        counts = np.searchsorted(self.keys, self.sign * values, side="right")
+        counts[np.isnan(values)] = 0
+        return counts
+
+    # Bitsets of the first counts[i] products in this dimension's order
+    def bitsets(self, counts: np.ndarray) -> np.ndarray:
+        bitsets = self.prefixes[counts // STRIDE]
+        remainder = counts % STRIDE
+        # (row, offset) for every product past the checkpoint; rows may share a word, hence .at
+        rows, offsets = np.nonzero(_OFFSETS < remainder[:, None])
+        products = self.order[counts[rows] - remainder[rows] + offsets]
+        np.bitwise_or.at(bitsets, (rows, products >> 6), np.uint64(1) << (products & 63).astype(np.uint64))
+        return bitsets
+
+
+class ProductMatcher:
+    def __init__(self, products):
+        # Rank order: lowest rate first, then the largest loan cap
+        self.products = sorted(products, key=lambda product: (product.rate, -product.max_loan_amount, product.id))
+        self.words = max(1, (len(self.products) + 63) // 64)
+        columns = {field: np.array([getattr(product, field) for product in self.products]) for field in Product._fields[4:]}
+        self.dimensions = {
+            value: _Dimension(columns[threshold], op, self.words) for value, threshold, op in DIMENSIONS
+        }
+
+    # Qualifying-product bitsets, (applicants, words) uint64, for columns of applicant details
+    def bitsets(self, columns: dict) -> np.ndarray:
+        values = {
+            "income": np.asarray(columns["income"], dtype=np.float64),
+            "credit_score": np.asarray(columns["credit_score"], dtype=np.float64),
+            "loan_amount": np.asarray(columns["loan_amount"], dtype=np.float64),
+        }
+        property_value = np.asarray(columns["property_value"], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values["ltv"] = np.where(property_value > 0, values["loan_amount"] / property_value, np.nan)
+
+        result = None
+        for name, dimension in self.dimensions.items():
+            bitsets = dimension.bitsets(dimension.counts(np.atleast_1d(values[name])))
+            result = bitsets if result is None else np.bitwise_and(result, bitsets, out=result)
+        return result
+
+    # Product indexes (in rank order) whose bits are set
+    def _indexes(self, bitset: np.ndarray) -> np.ndarray:
+        bits = np.unpackbits(bitset.view(np.uint8), bitorder="little")[:len(self.products)]
+        return np.flatnonzero(bits)
+
+    # Qualifying products for one applicant, best rate first
+    def match(self, details: dict, limit: int = None) -> list:
+        indexes = self._indexes(self.bitsets(details)[0])
+        if limit is not None:
+            indexes = indexes[:limit]
+        return [self._describe(index, details) for index in indexes.tolist()]
+
+    # max_loan is None for a product with neither an LTV nor a loan cap
+    def _describe(self, index: int, details: dict) -> dict:
+        product = self.products[index]
+        max_loan = min(product.max_ltv * float(details["property_value"]), product.max_loan_amount)
+        return {
+            "id": product.id,
+            "lender": product.lender,
+            "name": product.name,
+            "rate": product.rate,
+            "max_loan": round(max_loan, 2) if np.isfinite(max_loan) else None,
+        }
+
+    # Ranked qualifying product ids for every applicant in a dict of equally sized columns
+    def match_batch(self, columns: dict, limit: int = None) -> list:
+        size = len(columns["income"])
+        ids = np.array([product.id for product in self.products], dtype=object)
+        matches = []
+        for start in range(0, size, BLOCK_ROWS):
+            block = {field: np.asarray(columns[field])[start:start + BLOCK_ROWS] for field in
+                     ("income", "credit_score", "loan_amount", "property_value")}
+            bits = np.unpackbits(self.bitsets(block).view(np.uint8), axis=1, bitorder="little")[:, :len(self.products)]
+            for row in bits:
+                indexes = np.flatnonzero(row)
+                matches.append(ids[indexes[:limit]].tolist())
+        return matches
+
+    # Linear reference: every product checked against one applicant, for tests and benchmarks
+    def scan(self, details: dict) -> list:
+        ltv = details["loan_amount"] / details["property_value"] if details["property_value"] > 0 else np.nan
+        return [
+            product.id for product in self.products
+            if details["income"] >= product.min_income and details["credit_score"] >= product.min_credit_score
+            and ltv <= product.max_ltv and details["loan_amount"] <= product.max_loan_amount
+        ]
+
+
+class _Entry(NamedTuple):
+    matcher: ProductMatcher
+    mtime: float
+    checked: float
+
+
+# The matcher for the catalog file, rebuilt when the file changes (checked at most once a second)
+class CatalogRegistry:
+    def __init__(self, path: str = PRODUCT_CATALOG, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ProductMatcher:
+        entry = self._entry
+        now = time.monotonic()
+        if entry is not None and now - entry.checked < self.check_interval:
+            return entry.matcher
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            if self._entry is not None and self._entry.mtime == mtime:
+                self._entry = self._entry._replace(checked=now)
+                return self._entry.matcher
+            try:
+                matcher = ProductMatcher(load_catalog(self.path))
+            except Exception as exc:
+                if self._entry is None:
+                    raise
+                logger.error("Keeping previous product catalog; reload of %s failed: %s", self.path, exc)
+                self._entry = self._entry._replace(mtime=mtime, checked=now)
+                return self._entry.matcher
+            self._entry = _Entry(matcher, mtime, now)
+            return matcher
+
+
+registry = CatalogRegistry()
+
+
+def match_products(details: dict, limit: int = None) -> list:
+    return registry.get().match(details, limit)
+
+
+def match_products_batch(columns: dict, limit: int = None) -> list:
+    return registry.get().match_batch(columns, limit)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import numbers
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Render numbers canonically so 30000, 30000.0 and "30000" produce the same prompt
+def normalize_value(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            value = float(value.strip().replace(",", ""))
+        except ValueError:
+            return value
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+    return value
+
+
+def normalize_inputs(inputs: dict) -> dict:
+    return {name: normalize_value(value) for name, value in inputs.items()}
+
+
+# Key on the rendered prompt plus the model settings that change the answer
+def cache_key(prompt: str, model: str, temperature: float) -> str:
+    payload = json.dumps([model, float(temperature), prompt], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Shared on-disk tier so every worker process on a host sees the same entries
+class DiskCache:
+    # Prune after this many writes so the table stays near max_entries
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._writes = 0
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._connection().execute(
+            "SELECT value, expires FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None, None
+        return row[0], row[1]
+
+    def put(self, key: str, value: str, expires: float):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    # Drop expired rows, then the soonest-to-expire ones above max_entries; returns rows removed
+    def prune(self) -> int:
+        conn = self._connection()
+        now = time.time()
+        removed = conn.execute("DELETE FROM responses WHERE expires < ?", (now,)).rowcount
+        removed += conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        return removed
+
+    def clear(self):
+        self._connection().execute("DELETE FROM responses")
+
+
+# Bounded LRU cache with a per-entry TTL and an optional DiskCache behind it
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, disk_path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = DiskCache(disk_path) if disk_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+        if self.disk is not None:
+            value, expires = self.disk.get(key)
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                    self._store(key, value, expires)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: str):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires)
+        if self.disk is not None:
+            self.disk.put(key, value, expires)
+
+    def _store(self, key, value, expires):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,311 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import string
+import threading
+import time
+from typing import NamedTuple
+import numpy as np
+
+import amortization
+
+logger = logging.getLogger(__name__)
+
+RULESET_DIR = os.getenv("RULESET_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rulesets"))
+
+# Allowed comparisons, mapped to the comparison that means the rule failed
+FAILING_OP = {">=": "<", ">": "<=", "<=": ">", "<": ">="}
+
+# Fields computed from other inputs. When any input is missing the derived value is
+# NaN, every comparison against it is false, and rules on it pass: they are optional.
+DERIVED_FIELDS = {
+    "emi": (("loan_amount", "interest_rate", "tenure_months"), amortization.emi),
+}
+
+
+class RuleSetError(ValueError):
+    pass
+
+
+class Rule(NamedTuple):
+    id: str
+    bit: int
+    field: str
+    op: str
+    threshold: float
+    per: str
+    reason: str
+    suggestion: str
+
+    @property
+    def fields(self) -> tuple:
+        return (self.field,) if self.per is None else (self.field, self.per)
+
+    # Python expression that is true when the rule fails, e.g. (loan_amount > 0.8 * property_value)
+    def failing_expression(self) -> str:
+        bound = repr(self.threshold) if self.per is None else f"{self.threshold!r} * {self.per}"
+        return f"({self.field} {FAILING_OP[self.op]} {bound})"
+
+
+# A rule set compiled into Python source once: one expression that evaluates every
+# predicate exactly once, plus one function that formats reasons and suggestions.
+# The failure expression works on scalars and on NumPy columns alike.
+class RulePlan:
+    def __init__(self, product: str, rules, suggestion_order=None):
+        self.product = product
+        self.rules = tuple(rules)
+        self.by_id = {rule.id: rule for rule in self.rules}
+        rule_fields = tuple(dict.fromkeys(field for rule in self.rules for field in rule.fields))
+        self.derived = {field: DERIVED_FIELDS[field] for field in rule_fields if field in DERIVED_FIELDS}
+        # Inputs every applicant needs, and inputs that only feed derived fields
+        self.fields = tuple(field for field in rule_fields if field not in self.derived)
+        self.optional_fields = tuple(dict.fromkeys(
+            arg for args, _ in self.derived.values() for arg in args if arg not in self.fields
+        ))
+        self.all_fields = self.fields + tuple(self.derived)
+        self.suggestion_rules = tuple(self.by_id[rule_id] for rule_id in suggestion_order or self.by_id)
+        # Rules capping the loan as a fraction of another field give the max loan
+        self.loan_caps = tuple(rule for rule in self.rules if rule.field == "loan_amount" and rule.per)
+
+        # Inputs each rule reads, with derived fields expanded to the fields they are computed from
+        self.inputs = {
+            rule.id: tuple(dict.fromkeys(
+                arg for field in rule.fields for arg in (self.derived[field][0] if field in self.derived else (field,))
+            ))
+            for rule in self.rules
+        }
+        # field -> rules that read it
+        self.dependents = {
+            field: tuple(rule for rule in self.rules if field in self.inputs[rule.id])
+            for field in self.fields + self.optional_fields
+        }
+
+        terms = " | ".join(f"{self._failing(rule)} * {rule.bit}" for rule in self.rules) or "0"
+        self.source = f"lambda v: {self._bind(terms)}"
+        # Identifies the compiled decision logic, e.g. in audit records
+        self.fingerprint = int.from_bytes(hashlib.blake2b(self.source.encode(), digest_size=8).digest(), "little")
+        self._failures = self._compile(self.source, "eval")
+        # One predicate per rule as well, for re-checking only the rules whose inputs changed
+        self._checks = {
+            rule.id: self._compile(f"lambda v: {self._bind(self._failing(rule))}", "eval") for rule in self.rules
+        }
+        self._explain = self._compile(self._explain_source(), "exec")["explain"]
+
+    def _compile(self, source: str, mode: str):
+        namespace = {"__builtins__": {}, "min": min}
+        code = compile(source, f"<ruleset {self.product}>", mode)
+        if mode == "eval":
+            return eval(code, namespace)
+        exec(code, namespace)
+        return namespace
+
+    # The rule's failing expression, also true when a required input is NaN or infinite
+    # (x - x is then NaN, which != 0), so a missing value fails the rule instead of passing
+    # it. Derived fields stay optional.
+    def _failing(self, rule) -> str:
+        missing = [f"({field} - {field} != 0)" for field in rule.fields if field not in self.derived]
+        return "(" + " | ".join([rule.failing_expression()] + missing) + ")"
+
+    # Rewrite bare field names in a generated expression as lookups in the mapping v
+    def _bind(self, expression: str) -> str:
+        for field in sorted(self.all_fields, key=len, reverse=True):
+            expression = re.sub(rf"\b{field}\b", f"v[{field!r}]", expression)
+        return expression
+
+    def _max_loan_source(self) -> str:
+        caps = [f"{rule.threshold!r} * {rule.per}" for rule in self.loan_caps]
+        if not caps:
+            return "float('inf')"
+        return caps[0] if len(caps) == 1 else f"min({', '.join(caps)})"
+
+    def _explain_source(self) -> str:
+        lines = ["def explain(failures, v):"]
+        lines += [f"    {field} = v[{field!r}]" for field in self.all_fields]
+        lines.append(f"    max_loan = {self._max_loan_source()}" if self.loan_caps else "    max_loan = None")
+        lines.append("    reasons = []")
+        for rule in self.rules:
+            lines.append(f"    if failures & {rule.bit}: reasons.append({_fstring(rule.reason, self.all_fields)})")
+        lines.append("    suggestions = []")
+        for rule in self.suggestion_rules:
+            lines.append(f"    if failures & {rule.bit}: suggestions.append({_fstring(rule.suggestion, self.all_fields)})")
+        lines.append("    return reasons, suggestions")
+        return "\n".join(lines)
+
+    # Add derived fields to an applicant (or columns); values that already have them are returned as is
+    def prepare(self, values: dict) -> dict:
+        missing = [field for field in self.derived if field not in values]
+        if not missing:
+            return values
+        values = dict(values)
+        for field in missing:
+            args, function = self.derived[field]
+            inputs = [values.get(arg) for arg in args]
+            values[field] = np.nan if any(value is None for value in inputs) else function(*inputs)
+        return values
+
+    # Failure bitmask for one applicant
+    def evaluate_one(self, values: dict) -> int:
+        return int(self._failures(self.prepare(values)))
+
+    # Failure bits of just the given rules for one applicant
+    def evaluate_rules(self, values: dict, rules) -> int:
+        if any(rule.field in self.derived for rule in rules):
+            values = self.prepare(values)
+        failures = 0
+        for rule in rules:
+            if self._checks[rule.id](values):
+                failures |= rule.bit
+        return failures
+
+    # Failure bitmasks for a dict of equally sized columns
+    def evaluate(self, columns: dict) -> np.ndarray:
+        # inf - inf in the missing-value check is expected
+        with np.errstate(invalid="ignore"):
+            return np.asarray(self._failures(self.prepare(columns)), dtype=np.uint8)
+
+    # Largest loan every loan cap allows; works on scalars and columns
+    def max_loan(self, values):
+        limits = [rule.threshold * values[rule.per] for rule in self.loan_caps]
+        if not limits:
+            return np.full(np.shape(values["loan_amount"]), np.inf)
+        return functools.reduce(np.minimum, limits)
+
+    # (reasons, suggestions) for one applicant's failure bitmask
+    def explain(self, failures: int, values: dict):
+        return self._explain(failures, self.prepare(values))
+
+    def reasons(self, failures: int, values: dict) -> list:
+        return self.explain(failures, values)[0]
+
+    def suggestions(self, failures: int, values: dict) -> list:
+        return self.explain(failures, values)[1]
+
+
+# Turn a str.format template into f-string source over the plan's fields and max_loan
+def _fstring(template: str, fields) -> str:
+    allowed = set(fields) | {"max_loan"}
+    parts = []
+    for literal, name, spec, conversion in string.Formatter().parse(template):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if name is None:
+            continue
+        if name not in allowed or "{" in (spec or ""):
+            raise RuleSetError(f"Template {template!r} may only use {sorted(allowed)}")
+        parts.append("{" + name + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+    return "f" + repr("".join(parts))
+
+
+def _compile_rule(spec: dict, index: int) -> Rule:
+    try:
+        rule = Rule(
+            id=spec["id"],
+            bit=int(spec.get("bit", 1 << index)),
+            field=spec["field"],
+            op=spec["op"],
+            threshold=float(spec["threshold"]),
+            per=spec.get("per"),
+            reason=spec.get("reason", ""),
+            suggestion=spec.get("suggestion", ""),
+        )
+    except (KeyError, TypeError, ValueError) as exc:
+        raise RuleSetError(f"Rule #{index} is invalid: {exc!r}")
+
+    if rule.op not in FAILING_OP:
+        raise RuleSetError(f"Rule {rule.id!r} has unknown op {rule.op!r}")
+    for field in rule.fields:
+        if not isinstance(field, str) or not field.isidentifier():
+            raise RuleSetError(f"Rule {rule.id!r} refers to an invalid field {field!r}")
+    if rule.bit <= 0 or rule.bit > 128 or rule.bit & (rule.bit - 1):
+        raise RuleSetError(f"Rule {rule.id!r} needs a single bit between 1 and 128")
+    return rule
+
+
+# Validate a parsed rule set and compile it into a RulePlan
+def compile_ruleset(spec: dict) -> RulePlan:
+    rules = [_compile_rule(rule, index) for index, rule in enumerate(spec.get("rules", []))]
+    if len({rule.id for rule in rules}) != len(rules):
+        raise RuleSetError("Rule ids must be unique")
+    if len({rule.bit for rule in rules}) != len(rules):
+        raise RuleSetError("Rule bits must be unique")
+
+    order = spec.get("suggestion_order")
+    unknown = set(order or ()) - {rule.id for rule in rules}
+    if unknown:
+        raise RuleSetError(f"suggestion_order names unknown rules: {sorted(unknown)}")
+    return RulePlan(spec.get("product", "default"), rules, order)
+
+
+# Parse a JSON or YAML rule set file
+def load_ruleset(path: str) -> dict:
+    with open(path, encoding="utf-8") as file:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            return yaml.safe_load(file)
+        return json.load(file)
+
+
+class _Entry(NamedTuple):
+    plan: RulePlan
+    path: str
+    mtime: float
+    checked: float
+
+
+# Compiled plans per product, recompiled when their file changes on disk.
+# A file that fails to compile is logged and the previous plan stays active.
+class RuleRegistry:
+    def __init__(self, directory: str = RULESET_DIR, check_interval: float = 1.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _path(self, product: str) -> str:
+        for extension in (".json", ".yaml", ".yml"):
+            path = os.path.join(self.directory, product + extension)
+            if os.path.exists(path):
+                return path
+        raise RuleSetError(f"No rule set for product {product!r} in {self.directory}")
+
+    def get(self, product: str = "default") -> RulePlan:
+        entry = self._entries.get(product)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked < self.check_interval:
+            return entry.plan
+
+        with self._lock:
+            entry = self._entries.get(product)
+            path = entry.path if entry is not None else self._path(product)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                if entry is None:
+                    raise
+                mtime = entry.mtime
+
+            if entry is not None and mtime == entry.mtime:
+                self._entries[product] = entry._replace(checked=now)
+                return entry.plan
+
+            try:
+                plan = compile_ruleset(load_ruleset(path))
+            except Exception as exc:
+                if entry is None:
+                    raise
+                logger.error("Keeping previous rules for %s; reload of %s failed: %s", product, path, exc)
+                self._entries[product] = entry._replace(mtime=mtime, checked=now)
+                return entry.plan
+
+            self._entries[product] = _Entry(plan, path, mtime, now)
+            return plan
+
+
+registry = RuleRegistry()
+
+
+def get_plan(product: str = "default") -> RulePlan:
+    return registry.get(product)
@@ -0,0 +1,225 @@
+import argparse
+import csv
+import json
+import os
+import resource
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from eligibility import FIELDS, OPTIONAL_FIELDS, check_eligibility_batch, invalid_rows
+from rules import get_plan
+
+# Score large partner lead files offline:
+#   python score_cli.py leads.csv scored.csv --chunk-size 200000 --workers 4
+# Input is CSV or Parquet, read in chunks so memory stays bounded. Chunks are scored
+# in a process pool and written in order as they finish. Progress is checkpointed
+# after every written chunk, so rerunning the same command resumes an interrupted run.
+# Rows with a blank, non-numeric or out-of-range required field are written as not
+# eligible with failure code "invalid" and no max loan.
+
+OUTPUT_COLUMNS = ("row", "eligible", "failures", "failure_codes", "max_loan")
+INVALID = "invalid"
+
+
+def _check_columns(path: str, names) -> list:
+    missing = [field for field in FIELDS if field not in names]
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(missing)} column")
+    return [name for name in FIELDS + OPTIONAL_FIELDS if name in names]
+
+
+# Yield (index, columns) chunks from a CSV or Parquet file, skipping chunks already done
+def read_chunks(path: str, chunk_size: int, skip: int = 0):
+    if path.endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        file = pq.ParquetFile(path)
+        columns = _check_columns(path, file.schema_arrow.names)
+        for index, batch in enumerate(file.iter_batches(batch_size=chunk_size, columns=columns)):
+            if index >= skip:
+                # Nulls come back as NaN (or None in an object array); both are flagged by invalid_rows
+                yield index, {name: np.asarray(batch.column(name).to_numpy(zero_copy_only=False), dtype=np.float64)
+                              for name in columns}
+        return
+
+    import pandas as pd
+
+    columns = _check_columns(path, pd.read_csv(path, nrows=0).columns)
+    reader = pd.read_csv(path, usecols=columns, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    for index, frame in enumerate(reader):
+        if index >= skip:
+            # Blank and non-numeric cells become NaN rather than aborting the whole run
+            yield index, {name: pd.to_numeric(frame[name], errors="coerce").to_numpy(np.float64) for name in columns}
+
+
+# Names of the failed rules for each distinct bitmask, e.g. 5 -> "income|ltv"
+def failure_codes(product: str) -> dict:
+    rules = get_plan(product).rules
+    return {
+        mask: "|".join(rule.id for rule in rules if mask & rule.bit)
+        for mask in range(256)
+    }
+
+
+# Workers leave Ctrl-C to the parent, which checkpoints and shuts the pool down
+def _ignore_interrupts():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# Worker: score one chunk and return it ready to write
+def score_chunk(index: int, first_row: int, columns: dict, product: str):
+    result = check_eligibility_batch(columns, product)
+    invalid = invalid_rows(columns)
+    eligible = result.eligible & ~invalid
+    return index, first_row, eligible, result.failures, result.max_loan, invalid
+
+
+def write_chunk(writer, codes, first_row, eligible, failures, max_loan, invalid):
+    rows = np.arange(first_row, first_row + len(failures))
+    max_loan = np.round(max_loan, 2).astype(object)
+    max_loan[invalid] = ""
+    writer.writerows(zip(
+        rows.tolist(),
+        eligible.astype(np.uint8).tolist(),
+        failures.tolist(),
+        [INVALID if bad else codes[mask] for mask, bad in zip(failures.tolist(), invalid.tolist())],
+        max_loan.tolist(),
+    ))
+
+
+def load_checkpoint(path: str) -> dict:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"chunks": 0, "rows": 0, "bytes": 0}
+
+
+# Atomically record how far the output is known to be complete
+def save_checkpoint(path: str, state: dict):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
+
+
+# Peak resident set size in MiB, for this process and the worker processes
+def peak_rss_mib() -> float:
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(own, workers) / 2 ** 20
+
+
+def run(args) -> dict:
+    checkpoint_path = args.output + ".checkpoint"
+    state = load_checkpoint(checkpoint_path) if not args.restart else {"chunks": 0, "rows": 0, "bytes": 0}
+    # The checkpoint counts chunks, so resuming with another chunk size would skip the wrong rows
+    if state["chunks"] and state.get("chunk_size", args.chunk_size) != args.chunk_size:
+        raise SystemExit(f"{checkpoint_path} was written with --chunk-size {state['chunk_size']}; "
+                         f"rerun with that chunk size to resume, or pass --restart")
+    # Resuming needs the output the checkpoint describes, at least up to its last chunk
+    size = os.path.getsize(args.output) if os.path.exists(args.output) else None
+    if state["chunks"] and (size is None or size < state["bytes"]):
+        raise SystemExit(f"{args.output} is missing or shorter than {checkpoint_path} records; "
+                         f"pass --restart to score from the beginning")
+    codes = failure_codes(args.product)
+
+    if state["chunks"]:
+        # Drop anything written after the last checkpoint, then append
+        output = open(args.output, "r+", newline="")
+        output.truncate(state["bytes"])
+        output.seek(state["bytes"])
+        writer = csv.writer(output)
+    else:
+        output = open(args.output, "w", newline="")
+        writer = csv.writer(output)
+        writer.writerow(OUTPUT_COLUMNS)
+
+    started = time.perf_counter()
+    scored = 0
+    next_index = state["chunks"]
+    next_row = state["rows"]
+    finished = {}
+    pending = set()
+    # Chunks are read lazily and at most 2x workers are in flight or waiting to be written
+    # behind a slower earlier chunk, which bounds memory
+    max_in_flight = 2 * args.workers
+    chunks = read_chunks(args.input, args.chunk_size, skip=state["chunks"])
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_ignore_interrupts) as pool:
+        try:
+            exhausted = False
+            # Row offsets are only known once every earlier chunk has been read
+            first_row = state["rows"]
+            while pending or not exhausted:
+                while not exhausted and len(pending) + len(finished) < max_in_flight:
+                    try:
+                        index, columns = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    size = len(columns[FIELDS[0]])
+                    pending.add(pool.submit(score_chunk, index, first_row, columns, args.product))
+                    first_row += size
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, *result = future.result()
+                    finished[index] = result
+
+                # Write finished chunks in input order and checkpoint after each
+                while next_index in finished:
+                    chunk_first_row, eligible, failures, max_loan, invalid = finished.pop(next_index)
+                    write_chunk(writer, codes, chunk_first_row, eligible, failures, max_loan, invalid)
+                    output.flush()
+                    next_index += 1
+                    next_row = chunk_first_row + len(failures)
+                    scored += len(failures)
+                    save_checkpoint(checkpoint_path, {"chunks": next_index, "rows": next_row, "bytes": output.tell(),
+                                                      "chunk_size": args.chunk_size})
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"\nInterrupted after {next_index} chunks; rerun the same command to resume.", file=sys.stderr)
+            raise
+        finally:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": scored,
+        "total_rows": next_row,
+        "seconds": elapsed,
+        "rows_per_second": scored / elapsed if elapsed else 0.0,
+        "peak_rss_mib": peak_rss_mib(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of mortgage applicants")
+    parser.add_argument("input", help="CSV or Parquet file with income, credit_score, loan_amount, property_value")
+    parser.add_argument("output", help="CSV file to write results to")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--product", default="default", help="rule set to score against")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    args = parser.parse_args()
+
+    try:
+        stats = run(args)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    print(
+        f"Scored {stats['rows']:,} rows ({stats['total_rows']:,} total) in {stats['seconds']:.1f}s: "
+        f"{stats['rows_per_second']:,.0f} rows/sec, peak RSS {stats['peak_rss_mib']:.0f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from chat_messages import AIMessage, HumanMessage
+from conversation import MAX_MESSAGES, PAGE_SIZE, Conversation
+from eligibility import Evaluation
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+# In-process session manager for the Streamlit apps. Each browser session keeps only
+# its id in st.session_state; the chat state lives here in a compact slotted record.
+# Sessions idle for longer than idle_timeout, and the least recently used ones beyond
+# max_sessions, are evicted. With a ConversationStore attached, evicted sessions are
+# spilled to it and loaded back transparently on their next request.
+
+
+class SessionRecord:
+    __slots__ = ("session_id", "chat_history", "user_details", "next_step", "visible_messages",
+                 "saved_total", "last_access", "evaluation")
+
+    def __init__(self, session_id: str, chat_history: Conversation, user_details: dict, next_step: str):
+        self.session_id = session_id
+        self.chat_history = chat_history
+        self.user_details = user_details
+        self.next_step = next_step
+        self.visible_messages = PAGE_SIZE
+        # chat_history.total when the record was last written to the store
+        self.saved_total = chat_history.total
+        self.last_access = time.monotonic()
+        # Memoized eligibility result for user_details; not persisted, rebuilt on first use
+        self.evaluation = Evaluation()
+
+
+# Approximate bytes held by one record: the record, its messages and their text, and its details
+def record_size(record: SessionRecord) -> int:
+    size = sys.getsizeof(record) + sys.getsizeof(record.chat_history) + sys.getsizeof(record.chat_history.messages)
+    for message in record.chat_history:
+        size += sys.getsizeof(message) + sys.getsizeof(message.content)
+    size += sys.getsizeof(record.user_details)
+    for key, value in record.user_details.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size + sys.getsizeof(record.next_step)
+
+
+class SessionManager:
+    def __init__(self, max_sessions: int = 1000, idle_timeout: float = 1800, store=None,
+                 greeting: str = None, first_step: str = "get_income", max_messages: int = MAX_MESSAGES):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.store = store
+        self.greeting = greeting
+        self.first_step = first_step
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.spills = 0
+
+    # The session's record, from memory, the store, or freshly created
+    def get(self, session_id: str) -> SessionRecord:
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is not None:
+                self._sessions.move_to_end(session_id)
+                record.last_access = time.monotonic()
+                evicted = self._evict()
+            else:
+                evicted = ()
+        self._spill(evicted)
+        if record is not None:
+            return record
+
+        record = self._load(session_id) or self._new(session_id)
+        with self._lock:
+            # Another thread may have loaded the same session meanwhile; keep the first
+            record = self._sessions.setdefault(session_id, record)
+            self._sessions.move_to_end(session_id)
+            evicted = self._evict()
+        self._spill(evicted)
+        return record
+
+    def _new(self, session_id: str) -> SessionRecord:
+        messages = [AIMessage(content=self.greeting)] if self.greeting else []
+        with self._lock:
+            self.created += 1
+        return SessionRecord(session_id, Conversation(messages, self.max_messages), {}, self.first_step)
+
+    def _load(self, session_id: str):
+        if self.store is None:
+            return None
+        with span("session.load"):
+            messages, user_details, next_step = self.store.load(session_id, self.max_messages)
+        if not messages and not user_details:
+            return None
+        chat_history = Conversation(
+            (AIMessage(content=content) if role == "AI" else HumanMessage(content=content) for role, content in messages),
+            self.max_messages,
+        )
+        with self._lock:
+            self.loads += 1
+        return SessionRecord(session_id, chat_history, user_details, next_step)
+
+    # Drop expired sessions, then the least recently used ones over the limit. Called
+    # with the lock held; returns the evicted records so they can be spilled outside it.
+    def _evict(self) -> list:
+        evicted = []
+        deadline = time.monotonic() - self.idle_timeout
+        # Records are kept in access order, so the expired ones are at the front
+        while self._sessions:
+            record = next(iter(self._sessions.values()))
+            if record.last_access >= deadline:
+                break
+            evicted.append(self._sessions.popitem(last=False)[1])
+            self.expirations += 1
+        while len(self._sessions) > self.max_sessions:
+            evicted.append(self._sessions.popitem(last=False)[1])
+            self.evictions += 1
+        return evicted
+
+    def _spill(self, records):
+        for record in records:
+            if self.store is not None and self.save(record):
+                with self._lock:
+                    self.spills += 1
+        if records:
+            logger.debug("evicted %d sessions, %d remain", len(records), len(self._sessions))
+
+    # Write the messages added since the last save, and the current details, to the store
+    def save(self, record: SessionRecord) -> bool:
+        if self.store is None:
+            return False
+        messages = [("AI" if isinstance(message, AIMessage) else "Human", message.content)
+                    for message in record.chat_history.new_since(record.saved_total)]
+        with span("session.save"):
+            self.store.append(record.session_id, messages, record.user_details, record.next_step)
+        record.saved_total = record.chat_history.total
+        return True
+
+    # Evict idle sessions without waiting for the next request
+    def expire(self) -> int:
+        with self._lock:
+            evicted = self._evict()
+        self._spill(evicted)
+        return len(evicted)
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            records = list(self._sessions.values())
+            counters = {
+                "sessions": len(records),
+                "max_sessions": self.max_sessions,
+                "created": self.created,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "spills": self.spills,
+            }
+        memory = sum(record_size(record) for record in records)
+        counters["memory_bytes"] = memory
+        counters["bytes_per_session"] = memory / len(records) if records else 0.0
+        return counters
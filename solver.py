@@ -0,0 +1,144 @@
+import numpy as np
+
+import amortization
+from rules import get_plan
+
+# Closed-form "what-if" answers derived from a product's rule set. Every
+# function accepts scalars or NumPy arrays and broadcasts like NumPy does.
+
+# Comparison direction of each op: +1 means the field has a lower bound, -1 an upper bound
+DIRECTION = {">=": 1, ">": 1, "<=": -1, "<": -1}
+
+
+# Readable names for fields in suggestions
+LABELS = {"emi": "EMI"}
+
+
+# Bounds each rule puts on its fields, given whichever of the applicant's values are known
+def _rule_bounds(rule, values):
+    direction = DIRECTION[rule.op]
+    if rule.field == "emi":
+        yield from _emi_bounds(rule, values, direction)
+        return
+    if rule.per is None:
+        yield rule.field, direction, np.float64(rule.threshold)
+        return
+    if rule.per in values:
+        yield rule.field, direction, rule.threshold * np.asarray(values[rule.per], dtype=np.float64)
+    if rule.field in values:
+        # field OP t * per  =>  per (reversed OP) field / t, for a positive ratio t
+        with np.errstate(divide="ignore"):
+            yield rule.per, -direction, np.asarray(values[rule.field], dtype=np.float64) / rule.threshold
+
+
+# The EMI is linear in the loan, emi = loan * annuity(rate, term), so an
+# "emi OP t * income" rule bounds the loan as well as the income
+def _emi_bounds(rule, values, direction):
+    if not all(field in values for field in ("interest_rate", "tenure_months")):
+        return
+    annuity = amortization.emi(1.0, values["interest_rate"], values["tenure_months"])
+    if rule.per in values:
+        with np.errstate(divide="ignore"):
+            yield "loan_amount", direction, rule.threshold * np.asarray(values[rule.per], dtype=np.float64) / annuity
+    if "loan_amount" in values:
+        emi = np.asarray(values["loan_amount"], dtype=np.float64) * annuity
+        yield rule.per, -direction, emi / rule.threshold
+
+
+# Tightest bound on every field, e.g. min_income, min_credit_score, max_loan_amount, min_property_value
+def boundaries(values, product: str = "default") -> dict:
+    bounds = {}
+    for rule in get_plan(product).rules:
+        for field, direction, bound in _rule_bounds(rule, values):
+            name = ("min_" if direction > 0 else "max_") + field
+            combine = np.maximum if direction > 0 else np.minimum
+            bounds[name] = combine(bounds[name], bound) if name in bounds else bound
+    return bounds
+
+
+# How far each field is from its bound; zero where the applicant already passes
+def gaps(values, product: str = "default") -> dict:
+    result = {}
+    for name, bound in boundaries(values, product).items():
+        field = name[4:]
+        if field not in values:
+            continue
+        value = np.asarray(values[field], dtype=np.float64)
+        result[field] = np.maximum(bound - value, 0.0) if name.startswith("min_") else np.maximum(value - bound, 0.0)
+    return result
+
+
+def max_loan(property_value, product: str = "default"):
+    return get_plan(product).max_loan({"property_value": np.asarray(property_value, dtype=np.float64)})
+
+
+def min_property_value(loan_amount, product: str = "default"):
+    return boundaries({"loan_amount": loan_amount}, product).get("min_property_value", np.float64(0.0))
+
+
+# None when the product has no credit score rule
+def credit_gap(credit_score, product: str = "default"):
+    minimum = boundaries({}, product).get("min_credit_score")
+    if minimum is None:
+        return None
+    return np.maximum(minimum - np.asarray(credit_score, dtype=np.float64), 0.0)
+
+
+# Failure bitmasks over a grid: y_values along rows, x_values along columns, other fields from base.
+# Optional inputs in base (the loan terms) are kept, so derived fields such as the EMI are
+# recomputed at every grid point; a required field missing from base fails its rules.
+def sensitivity_surface(base: dict, x_field: str, x_values, y_field: str, y_values, product: str = "default"):
+    plan = get_plan(product)
+    grid = {field: np.float64(base.get(field, np.nan)) for field in plan.fields if field not in (x_field, y_field)}
+    grid.update((field, np.float64(base[field])) for field in plan.optional_fields
+                if field in base and field not in (x_field, y_field))
+    grid[x_field] = np.asarray(x_values, dtype=np.float64)[np.newaxis, :]
+    grid[y_field] = np.asarray(y_values, dtype=np.float64)[:, np.newaxis]
+    failures = plan.evaluate(grid)
+    return np.broadcast_to(failures, (len(grid[y_field]), grid[x_field].shape[1]))
+
+
+def _known(value):
+    if value is None:
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+# Advisor-style suggestions computed from the boundaries instead of the full check
+def improvement_suggestions(details: dict, product: str = "default") -> list:
+    plan = get_plan(product)
+    details = plan.prepare(details)
+    suggestions = []
+    for rule in plan.suggestion_rules:
+        label = LABELS.get(rule.field, rule.field.replace("_", " "))
+        # Rules whose inputs are absent (or whose derived field could not be computed) are skipped
+        value = _known(details.get(rule.field))
+        per = _known(details.get(rule.per)) if rule.per is not None else None
+        if value is None or (rule.per is not None and per is None):
+            continue
+        if rule.per is not None and DIRECTION[rule.op] < 0:
+            limit = rule.threshold * per
+            if value > limit or (value == limit and rule.op == "<"):
+                suggestions.append(
+                    f"Lower the {label} to at most {limit:,.0f} ({value - limit:,.0f} less), "
+                    f"or raise the {rule.per.replace('_', ' ')} to at least {value / rule.threshold:,.0f}."
+                )
+        elif rule.per is not None:
+            limit = rule.threshold * per
+            if value < limit or (value == limit and rule.op == ">"):
+                suggestions.append(
+                    f"Raise the {label} to at least {limit:,.0f} ({limit - value:,.0f} more), "
+                    f"or lower the {rule.per.replace('_', ' ')} to at most {value / rule.threshold:,.0f}."
+                )
+        elif rule.per is None and DIRECTION[rule.op] > 0:
+            if value < rule.threshold or (value == rule.threshold and rule.op == ">"):
+                suggestions.append(
+                    f"Raise your {label} by {rule.threshold - value:,.0f} to reach the minimum of {rule.threshold:,.0f}."
+                )
+        elif rule.per is None:
+            if value > rule.threshold or (value == rule.threshold and rule.op == "<"):
+                suggestions.append(
+                    f"Reduce your {label} by {value - rule.threshold:,.0f} to stay within {rule.threshold:,.0f}."
+                )
+    return suggestions
@@ -0,0 +1,232 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import NamedTuple
+
+import numpy as np
+
+from eligibility import FIELDS, OPTIONAL_FIELDS, check_eligibility_batch, invalid_rows
+from rules import get_plan
+
+# Monte Carlo stress test of an applicant book against the eligibility rules:
+#   python stress.py leads.csv --scenarios 1000 --workers 4 --output scenarios.csv
+# Each scenario draws a book-wide shock to incomes, credit scores and property values,
+# plus per-applicant noise around it, and re-scores every currently eligible applicant.
+# The book is read in chunks and each chunk evaluates a block of scenarios at a time as
+# one (scenarios, applicants) array, so memory is bounded by chunk size and max_cells.
+
+# Cells per (scenarios, applicants) block; a few float arrays of this size are live at once
+MAX_CELLS = 1 << 21
+CREDIT_SCORE_RANGE = (300.0, 900.0)
+
+
+# Scenario model. Drifts and vols describe the book-wide shock drawn once per scenario,
+# noise the per-applicant spread around it. Income and property value shocks are log
+# changes; credit score shocks are points.
+class Shocks(NamedTuple):
+    income_drift: float = -0.05
+    income_vol: float = 0.10
+    income_noise: float = 0.10
+    credit_drift: float = -10.0
+    credit_vol: float = 15.0
+    credit_noise: float = 20.0
+    property_drift: float = -0.05
+    property_vol: float = 0.10
+    property_noise: float = 0.05
+
+
+class StressResult(NamedTuple):
+    applicants: int
+    eligible: int
+    # Book-wide shocks per scenario: income and property value factors, credit score shift
+    factors: dict
+    # Baseline-eligible applicants still eligible, per scenario
+    passes: np.ndarray
+    # Baseline-eligible applicants failing each rule, per scenario and rule
+    rule_failures: np.ndarray
+    rule_ids: tuple
+
+    @property
+    def pass_rate(self) -> np.ndarray:
+        return self.passes / self.eligible if self.eligible else np.ones(len(self.passes))
+
+
+# Book-wide shocks for every scenario, drawn once so each chunk sees the same scenarios
+def scenario_factors(shocks: Shocks, scenarios: int, seed: int) -> dict:
+    rng = np.random.default_rng([seed, 0])
+    return {
+        "income": rng.normal(shocks.income_drift, shocks.income_vol, scenarios),
+        "credit_score": rng.normal(shocks.credit_drift, shocks.credit_vol, scenarios),
+        "property_value": rng.normal(shocks.property_drift, shocks.property_vol, scenarios),
+    }
+
+
+# Worker: run every scenario over the eligible rows of one chunk. Noise is seeded by
+# chunk and scenario block, so results do not depend on the number of workers.
+def simulate_chunk(index: int, columns: dict, factors: dict, shocks: Shocks, seed: int,
+                   product: str = "default", max_cells: int = MAX_CELLS):
+    plan = get_plan(product)
+    # Rows that cannot be scored are never counted as eligible today
+    eligible = check_eligibility_batch(columns, product).eligible & ~invalid_rows(columns)
+    # EMI depends only on the loan terms, which the shocks leave alone, so derive it once
+    columns = plan.prepare({field: np.asarray(column)[eligible] for field, column in columns.items()})
+    rows = int(eligible.sum())
+    scenarios = len(factors["income"])
+    passes = np.zeros(scenarios, dtype=np.int64)
+    rule_failures = np.zeros((scenarios, len(plan.rules)), dtype=np.int64)
+    if not rows:
+        return index, len(eligible), rows, passes, rule_failures
+
+    block = max(1, max_cells // rows)
+    for start in range(0, scenarios, block):
+        stop = min(start + block, scenarios)
+        rng = np.random.default_rng([seed, 1, index, start])
+
+        def noise(scale):
+            return rng.standard_normal((stop - start, rows), dtype=np.float32) * np.float32(scale)
+
+        shocked = dict(columns)
+        shocked["income"] = columns["income"] * np.exp(factors["income"][start:stop, None] + noise(shocks.income_noise))
+        shocked["credit_score"] = np.clip(
+            columns["credit_score"] + factors["credit_score"][start:stop, None] + noise(shocks.credit_noise),
+            *CREDIT_SCORE_RANGE,
+        )
+        shocked["property_value"] = columns["property_value"] * np.exp(
+            factors["property_value"][start:stop, None] + noise(shocks.property_noise)
+        )
+
+        failures = plan.evaluate(shocked)
+        passes[start:stop] = np.count_nonzero(failures == 0, axis=1)
+        for position, rule in enumerate(plan.rules):
+            rule_failures[start:stop, position] = np.count_nonzero(failures & rule.bit, axis=1)
+    return index, len(eligible), rows, passes, rule_failures
+
+
+# Run the scenarios over an iterable of (index, columns) chunks, in a process pool when workers > 1
+def run_stress(chunks, scenarios: int = 1000, shocks: Shocks = Shocks(), seed: int = 0,
+               product: str = "default", workers: int = 1, max_cells: int = MAX_CELLS) -> StressResult:
+    factors = scenario_factors(shocks, scenarios, seed)
+    rule_ids = tuple(rule.id for rule in get_plan(product).rules)
+    totals = [0, 0, np.zeros(scenarios, dtype=np.int64), np.zeros((scenarios, len(rule_ids)), dtype=np.int64)]
+
+    def add(result):
+        for position, value in enumerate(result[1:]):
+            totals[position] += value
+
+    if workers <= 1:
+        for index, columns in chunks:
+            add(simulate_chunk(index, columns, factors, shocks, seed, product, max_cells))
+    else:
+        # At most 2x workers chunks are in flight, which bounds memory as in score_cli.py
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for index, columns in chunks:
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        add(future.result())
+                pending.add(pool.submit(simulate_chunk, index, columns, factors, shocks, seed, product, max_cells))
+            for future in pending:
+                add(future.result())
+
+    applicants, eligible, passes, rule_failures = totals
+    credit_shift = factors.pop("credit_score")
+    factors = {"income": np.exp(factors["income"]), "credit_score": credit_shift,
+               "property_value": np.exp(factors["property_value"])}
+    return StressResult(applicants, eligible, factors, passes, rule_failures, rule_ids)
+
+
+# Stress test an in-memory book: a dict of arrays or a DataFrame. Columns other than the
+# applicant fields (ids, names, ...) are ignored.
+def stress_test(data, scenarios: int = 1000, shocks: Shocks = Shocks(), seed: int = 0, product: str = "default",
+                chunk_size: int = 100000, workers: int = 1, max_cells: int = MAX_CELLS) -> StressResult:
+    columns = {field: np.asarray(data[field], dtype=np.float64) for field in FIELDS + OPTIONAL_FIELDS
+               if field in data}
+    size = len(columns[FIELDS[0]])
+    chunks = (
+        (index, {field: column[start:start + chunk_size] for field, column in columns.items()})
+        for index, start in enumerate(range(0, size, chunk_size))
+    )
+    return run_stress(chunks, scenarios, shocks, seed, product, workers, max_cells)
+
+
+# Pass-rate distribution and failure attribution across scenarios
+def summarize(result: StressResult) -> dict:
+    pass_rate = result.pass_rate
+    failed = int((result.eligible - result.passes).sum())
+    by_rule = result.rule_failures.sum(axis=0)
+    # Share of (applicant, scenario) failures in which each rule failed; an applicant can fail several
+    shares = {rule_id: float(count / failed) if failed else 0.0 for rule_id, count in zip(result.rule_ids, by_rule)}
+    counts, edges = np.histogram(pass_rate, bins=20, range=(0.0, 1.0))
+    return {
+        "applicants": result.applicants,
+        "eligible": result.eligible,
+        "scenarios": len(pass_rate),
+        "pass_rate": {
+            "mean": float(pass_rate.mean()),
+            "std": float(pass_rate.std()),
+            "min": float(pass_rate.min()),
+            **{f"p{q}": float(np.percentile(pass_rate, q)) for q in (1, 5, 50, 95)},
+            "max": float(pass_rate.max()),
+        },
+        "expected_failures": float(result.eligible - result.passes.mean()),
+        "rule_shares": shares,
+        "top_rule": result.rule_ids[int(by_rule.argmax())] if failed else None,
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+# One row per scenario: its shocks, pass rate and failures by rule
+def write_scenarios(path: str, result: StressResult):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(("scenario", "income_factor", "credit_shift", "property_factor", "pass_rate") + result.rule_ids)
+        factors = result.factors
+        for scenario, pass_rate in enumerate(result.pass_rate.tolist()):
+            writer.writerow((
+                scenario,
+                round(float(factors["income"][scenario]), 4),
+                round(float(factors["credit_score"][scenario]), 2),
+                round(float(factors["property_value"][scenario]), 4),
+                round(pass_rate, 6),
+                *result.rule_failures[scenario].tolist(),
+            ))
+
+
+def main():
+    from score_cli import peak_rss_mib, read_chunks
+
+    parser = argparse.ArgumentParser(description="Monte Carlo stress test of an applicant book")
+    parser.add_argument("input", help="CSV or Parquet file with income, credit_score, loan_amount, property_value")
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--product", default="default", help="rule set to score against")
+    parser.add_argument("--output", help="CSV file to write per-scenario results to")
+    for field, default in Shocks._field_defaults.items():
+        parser.add_argument("--" + field.replace("_", "-"), type=float, default=default)
+    args = parser.parse_args()
+
+    shocks = Shocks(**{field: getattr(args, field) for field in Shocks._fields})
+    started = time.perf_counter()
+    result = run_stress(read_chunks(args.input, args.chunk_size), args.scenarios, shocks, args.seed,
+                        args.product, args.workers)
+    elapsed = time.perf_counter() - started
+    if args.output:
+        write_scenarios(args.output, result)
+
+    summary = summarize(result)
+    rates = summary["pass_rate"]
+    print(f"{summary['eligible']:,} of {summary['applicants']:,} applicants eligible today; "
+          f"{summary['scenarios']:,} scenarios in {elapsed:.1f}s, peak RSS {peak_rss_mib():.0f} MiB")
+    print(f"Still eligible: mean {rates['mean']:.1%}, p5 {rates['p5']:.1%}, p1 {rates['p1']:.1%}, "
+          f"worst {rates['min']:.1%} ({summary['expected_failures']:,.0f} applicants fail on average)")
+    for rule_id, share in sorted(summary["rule_shares"].items(), key=lambda item: -item[1]):
+        print(f"  {rule_id:<16}{share:>7.1%} of failures")
+
+
+if __name__ == "__main__":
+    main()